@@ -1,8 +1,18 @@
 import os
-from osgeo import gdal, ogr
+import sys
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from osgeo import gdal, ogr, osr
 
 gdal.UseExceptions()
 
+# Clip progress goes through logging; nothing is emitted unless the caller
+# (or __main__ below) configures a handler. CLIP_LOG_LEVEL sets the level.
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
 # =====================================================
 # PATHS - GROUND TRUTH SPECIFIC
 # =====================================================
@@ -21,95 +31,377 @@ os.makedirs(output_dir, exist_ok=True)
 # Output clipped file
 output_file = os.path.join(output_dir, "landcover-2020-classification_CLIPPED.tif")
 
+# Alberta boundary rasterized on the 30m grid - built once, reused by every clip
+alberta_mask_file = os.path.join(output_dir, "Alberta_EPSG_3979_mask_30m.tif")
+
+# Minimum output tile size and the window the warper computes at a time. The
+# actual tile size follows the source block layout (see output_block_size_for),
+# and windows are whole multiples of it so every warped window maps onto
+# complete output tiles (no partial compressed-tile writes).
+min_output_block_size = 256
+warp_window_target = 2048
+
+# Compression for the clipped label map. ZSTD writes and reads faster than LZW;
+# set GT_COMPRESSION=LZW if a downstream loader cannot decode ZSTD.
+gt_compression = os.environ.get("GT_COMPRESSION", "ZSTD").upper()
+
+# Set CLIP_VERBOSE=1 to print the detailed input file report
+clip_verbose = os.environ.get("CLIP_VERBOSE") == "1"
+
+# Optional extra (input, output) rasters clipped in parallel with the ground
+# truth using the same boundary, grid and settings. The settings are the label
+# map's (band 1 only, nearest resampling, no predictor), so only single-band
+# categorical rasters belong here - e.g. another year's land cover map. Sensor
+# reflectance mosaics are clipped by their own step-02 scripts. Empty by default.
+batch_jobs = []
+
+# Target CRS shared by all datasets (NAD83 / Statistics Canada Lambert)
+target_srs = osr.SpatialReference()
+target_srs.ImportFromEPSG(3979)
+
+def is_epsg_3979(ds):
+    """Check the dataset CRS against EPSG:3979 regardless of how it is encoded"""
+    srs = ds.GetSpatialRef()
+    return bool(srs is not None and srs.IsSame(target_srs))
+
+# =====================================================
+# RASTER BOUNDS
+# =====================================================
+def bounds_from(ds):
+    """Return (minx, miny, maxx, maxy) of a dataset from its four transformed corners"""
+    gt = np.asarray(ds.GetGeoTransform())
+    w, h = ds.RasterXSize, ds.RasterYSize
+    corners = np.array([[0, 0], [w, 0], [0, h], [w, h]])
+    # Full affine, so rotated geotransforms (gt[2], gt[4] != 0) are handled too
+    xs = gt[0] + corners[:, 0] * gt[1] + corners[:, 1] * gt[2]
+    ys = gt[3] + corners[:, 0] * gt[4] + corners[:, 1] * gt[5]
+    return xs.min(), ys.min(), xs.max(), ys.max()
+
+def output_block_size_for(src_block_x, src_block_y):
+    """Output tile size mirroring the source tiling (nearest multiple of 256)"""
+    # Stripped sources span the full width - tile the output at the minimum
+    if src_block_y == 1 or src_block_x <= min_output_block_size:
+        return min_output_block_size
+    return min_output_block_size * (src_block_x // min_output_block_size)
+
+# =====================================================
+# DIMENSION SIDECARS
+# =====================================================
+def write_dims_sidecar(path, width, height, gt, crs_ok):
+    """Record raster geometry in <path>.dims.json so checks can skip opening it"""
+    with open(path + ".dims.json", "w") as f:
+        json.dump({"w": width, "h": height, "gt": list(gt),
+                   "epsg": 3979 if crs_ok else None}, f)
+
+def read_dims(path):
+    """Return (width, height, geotransform, crs_ok) from the sidecar, or the raster header"""
+    sidecar = path + ".dims.json"
+    try:
+        # Only trust a sidecar written after the raster itself
+        if os.stat(sidecar).st_mtime >= os.stat(path).st_mtime:
+            with open(sidecar) as f:
+                dims = json.load(f)
+            return dims["w"], dims["h"], dims["gt"], dims["epsg"] == 3979
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    # Metadata-only open - only the header is needed
+    ds = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY | gdal.OF_VERBOSE_ERROR)
+    dims = (ds.RasterXSize, ds.RasterYSize, ds.GetGeoTransform(), is_epsg_3979(ds))
+    ds = None
+    return dims
+
+# =====================================================
+# CUTLINE PRE-CHECK
+# =====================================================
+def raster_coverage_by_cutline(ds):
+    """Return the fraction of the raster envelope covered by the Alberta boundary"""
+    # Union all boundary features into a single multipolygon
+    cutline_ds = ogr.Open(alberta_gpkg)
+    layer = cutline_ds.GetLayer()
+    cutline = ogr.Geometry(ogr.wkbMultiPolygon)
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        if geom is None:
+            continue
+        if geom.GetGeometryType() in (ogr.wkbMultiPolygon, ogr.wkbMultiPolygon25D):
+            for i in range(geom.GetGeometryCount()):
+                cutline.AddGeometry(geom.GetGeometryRef(i))
+        else:
+            cutline.AddGeometry(geom)
+    cutline_ds = None
+    cutline = cutline.UnionCascaded()
+    
+    # Raster envelope polygon
+    xLeft, yBottom, xRight, yTop = bounds_from(ds)
+    
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    ring.AddPoint(xLeft, yTop)
+    ring.AddPoint(xLeft, yBottom)
+    ring.AddPoint(xRight, yBottom)
+    ring.AddPoint(xRight, yTop)
+    ring.AddPoint(xLeft, yTop)
+    rasterGeometry = ogr.Geometry(ogr.wkbPolygon)
+    rasterGeometry.AddGeometry(ring)
+    
+    inter = rasterGeometry.Intersection(cutline)
+    if inter is None or inter.IsEmpty():
+        return 0.0
+    return inter.GetArea() / rasterGeometry.GetArea()
+
+# =====================================================
+# RASTERIZED CUTLINE MASK
+# =====================================================
+def build_alberta_mask():
+    """Rasterize the Alberta boundary to a 30m Byte mask (1 inside, 0 outside), cached on disk"""
+    # Rebuilt whenever the boundary file has been edited since the mask was made
+    if (not os.path.exists(alberta_mask_file)
+            or os.path.getmtime(alberta_gpkg) > os.path.getmtime(alberta_mask_file)):
+        log.info("Rasterizing Alberta boundary to %s...", os.path.basename(alberta_mask_file))
+        # Renamed into place once complete, so an interrupted rasterize never leaves a usable mask
+        partial_file = alberta_mask_file + ".partial"
+        ds = gdal.Rasterize(
+            partial_file,
+            alberta_gpkg,
+            format="GTiff",
+            xRes=30,  # Same grid as cropToCutline with xRes=30, yRes=30
+            yRes=30,
+            burnValues=[1],
+            initValues=[0],
+            outputType=gdal.GDT_Byte,
+            creationOptions=[
+                "COMPRESS=ZSTD",
+                "TILED=YES",
+                "BLOCKXSIZE=256",
+                "BLOCKYSIZE=256"
+            ]
+        )
+        ds = None
+        os.replace(partial_file, alberta_mask_file)
+    return alberta_mask_file
+
+def build_masked_vrt(source_path, mask_path, data_type=gdal.GDT_Byte):
+    """In-memory VRT multiplying a raster on the mask grid by the Alberta mask"""
+    mask_ds = gdal.Open(mask_path)
+    vrt = gdal.GetDriverByName("VRT").Create("", mask_ds.RasterXSize, mask_ds.RasterYSize, 0)
+    vrt.SetGeoTransform(mask_ds.GetGeoTransform())
+    vrt.SetSpatialRef(mask_ds.GetSpatialRef())
+    mask_ds = None
+    
+    vrt.AddBand(data_type, ["subClass=VRTDerivedRasterBand", "PixelFunctionType=mul"])
+    band = vrt.GetRasterBand(1)
+    band.SetNoDataValue(0)
+    for i, path in enumerate([source_path, mask_path]):
+        band.SetMetadataItem(
+            f"source_{i}",
+            f"<SimpleSource><SourceFilename relativeToVRT=\"0\">{path}</SourceFilename>"
+            f"<SourceBand>1</SourceBand></SimpleSource>",
+            "new_vrt_sources"
+        )
+    return vrt
+
 # =====================================================
 # CLIP GROUND TRUTH LABEL MAP - IDENTICAL TO LANDSAT-8
 # =====================================================
 def clip_ground_truth():
     """Clip ground truth label map - IDENTICAL METHOD to Landsat-8"""
-    print("=" * 70)
-    print("CLIPPING GROUND TRUTH LABEL MAP - IDENTICAL TO LANDSAT-8")
-    print("=" * 70)
-    print(f"Input file: {input_file}")
-    print(f"Output file: {output_file}")
-    print(f"Clip boundary: {alberta_gpkg}")
-    print("CRS: EPSG:3979 (NAD83 / Statistics Canada Lambert)")
-    print("Resolution: 30m")
-    print("Data type: Byte (UInt8)")
-    print("=" * 70)
+    log.info("=" * 70)
+    log.info("CLIPPING GROUND TRUTH LABEL MAP - IDENTICAL TO LANDSAT-8")
+    log.info("=" * 70)
+    log.info("Input file: %s", input_file)
+    log.info("Output file: %s", output_file)
+    log.info("Clip boundary: %s", alberta_gpkg)
+    log.info("CRS: EPSG:3979 (NAD83 / Statistics Canada Lambert)")
+    log.info("Resolution: 30m")
+    log.info("Data type: Byte (UInt8)")
+    log.info("=" * 70)
     
-    if not os.path.exists(input_file):
-        print(f"✗ ERROR: Input file not found!")
-        print(f"Checked: {input_file}")
+    return clip_one(input_file, output_file)
+
+def clip_one(input_path, output_path, num_threads="ALL_CPUS", cache_bytes=4 * 1024**3):
+    """Clip one raster to the Alberta boundary on the shared 30m EPSG:3979 grid"""
+    # One stat call per file - each check is a round-trip on network drives
+    try:
+        input_stat = os.stat(input_path)
+    except FileNotFoundError:
+        log.error("✗ ERROR: Input file not found!")
+        log.info("Checked: %s", input_path)
         return False
     
     try:
         # First, check the input file properties
-        print("Checking input file properties...")
-        ds = gdal.Open(input_file)
+        ds = gdal.Open(input_path)
         if ds:
-            width = ds.RasterXSize
-            height = ds.RasterYSize
             gt = ds.GetGeoTransform()
-            proj = ds.GetProjection()
-            band = ds.GetRasterBand(1)
-            data_type = gdal.GetDataTypeName(band.DataType)
-            no_data = band.GetNoDataValue()
+            crs_ok = is_epsg_3979(ds)
+            src_band = ds.GetRasterBand(1)
+            band_type = src_band.DataType
+            src_block_x, src_block_y = src_band.GetBlockSize()
+            src_width = ds.RasterXSize
             
-            # Calculate bounds
-            minx = gt[0]
-            maxx = minx + width * gt[1]
-            maxy = gt[3]
-            miny = maxy + height * gt[5]
+            # Same CRS and 30m pixels - no resampling is ever required
+            on_30m_grid = abs(gt[1] - 30) < 0.001 and abs(gt[5] + 30) < 0.001 and crs_ok
             
-            ds = None
+            # A raster lying entirely inside Alberta on the target grid
+            # needs no cutline evaluation - a plain repack is enough
+            inside_cutline = on_30m_grid and raster_coverage_by_cutline(ds) >= 0.999
+            
+            # Detailed report is diagnostic only - skipped on the common path
+            if clip_verbose:
+                log.info("Checking input file properties...")
+                width = ds.RasterXSize
+                height = ds.RasterYSize
+                band = ds.GetRasterBand(1)
+                data_type = gdal.GetDataTypeName(band.DataType)
+                no_data = band.GetNoDataValue()
+                
+                # Calculate bounds
+                minx, miny, maxx, maxy = bounds_from(ds)
+                
+                log.info("✓ Input file properties:")
+                log.info("  Dimensions: %s x %s pixels", width, height)
+                log.info("  File size: %.1f MB", input_stat.st_size / (1024 * 1024))
+                log.info("  Data type: %s", data_type)
+                log.info("  NoData value: %s", no_data)
+                log.info("  Resolution: %.2f m", gt[1])
+                log.info("  Bounds X: %.0f to %.0f", minx, maxx)
+                log.info("  Bounds Y: %.0f to %.0f", miny, maxy)
+                log.info("  CRS: EPSG:3979 %s", '✓' if crs_ok else '✗')
             
-            print(f"✓ Input file properties:")
-            print(f"  Dimensions: {width} x {height} pixels")
-            print(f"  Data type: {data_type}")
-            print(f"  NoData value: {no_data}")
-            print(f"  Resolution: {gt[1]:.2f} m")
-            print(f"  Bounds X: {minx:.0f} to {maxx:.0f}")
-            print(f"  Bounds Y: {miny:.0f} to {maxy:.0f}")
-            print(f"  CRS: EPSG:3979 {'✓' if '3979' in proj else '✗'}")
+            ds = None
         else:
-            print("✗ ERROR: Cannot open input file")
+            log.error("✗ ERROR: Cannot open input file")
             return False
         
-        # Clip the ground truth - IDENTICAL SETTINGS to Landsat-8
-        print(f"\nClipping to Alberta boundary...")
+        # Output tiles mirror the source tiling so each source block feeds
+        # whole destination tiles instead of being re-read for several
+        block_size = output_block_size_for(src_block_x, src_block_y)
+        warp_window_size = max(block_size, (warp_window_target // block_size) * block_size)
         
-        warp_options = gdal.WarpOptions(
-            format="GTiff",
-            cutlineDSName=alberta_gpkg,
-            cropToCutline=True,          # Same as Landsat-8
-            dstNodata=0,                 # Same as Landsat-8
-            resampleAlg='near',          # Same as Landsat-8
-            creationOptions=[
-                "COMPRESS=LZW",          # Same as Landsat-8
-                "PREDICTOR=2",           # Same as Landsat-8
-                "TILED=YES",             # Same as Landsat-8
-                "BLOCKXSIZE=256",        # Same as Landsat-8
-                "BLOCKYSIZE=256",        # Same as Landsat-8
-                "BIGTIFF=YES",           # Same as Landsat-8
-                "NUM_THREADS=ALL_CPUS"   # Same as Landsat-8
-            ],
-            # Preserve original resolution and CRS - IDENTICAL to Landsat-8
-            xRes=30,  # 30m resolution - Same as Landsat-8
-            yRes=30,  # 30m resolution - Same as Landsat-8
-            targetAlignedPixels=False # Same as Landsat-8 - Allows pixel boundaries to shift
-        )
+        # A stripped source (one row per block) is still written as tiles - the
+        # cache must hold a full tile height of source rows to avoid re-reads
+        if src_block_y == 1:
+            bytes_per_pixel = gdal.GetDataTypeSize(band_type) // 8
+            cache_bytes = max(cache_bytes, src_width * block_size * bytes_per_pixel)
         
-        ds = gdal.Warp(output_file, input_file, options=warp_options)
-        ds = None
+        # Keep source/destination blocks resident (default is 5% of RAM)
+        gdal.SetCacheMax(cache_bytes)
+        
+        if gt_compression == "LZW":
+            compression_options = ["COMPRESS=LZW", "PREDICTOR=YES"]  # Same as Landsat-8
+        else:
+            # Class codes are categorical - horizontal differencing does not help
+            compression_options = ["COMPRESS=ZSTD", "LEVEL=9", "PREDICTOR=NO"]
+        
+        # Cloud-Optimized GeoTIFF: tiling, compression and internal overviews
+        # are produced in a single pass, so no separate gdaladdo run is needed
+        creation_options = compression_options + [
+            f"BLOCKSIZE={block_size}",
+            "BIGTIFF=IF_SAFER",      # Classic TIFF unless the output may exceed 4 GB
+            f"NUM_THREADS={num_threads}",  # Same as Landsat-8
+            "OVERVIEWS=AUTO",
+            "RESAMPLING=NEAREST",    # Categorical labels - never average class codes
+            "OVERVIEW_RESAMPLING=NEAREST"
+        ]
+        
+        # Warp chunking, overview generation and compression run on all cores
+        gdal.SetConfigOption("GDAL_NUM_THREADS", num_threads)
+        
+        # The source is scanned once end to end - read it in large cached
+        # chunks, and skip the sidecar directory listing on every open
+        gdal.SetConfigOption("VSI_CACHE", "TRUE")
+        gdal.SetConfigOption("VSI_CACHE_SIZE", str(256 * 1024 * 1024))
+        gdal.SetConfigOption("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+        
+        if inside_cutline:
+            # Nothing outside the boundary to mask and no resampling needed
+            log.info("\nInput lies fully inside Alberta boundary - skipping warp...")
+            ds = gdal.Translate(output_path, input_path, format="COG",
+                                noData=0,
+                                creationOptions=creation_options,
+                                callback=gdal.TermProgress_nocb)
+        else:
+            # Clip the ground truth - IDENTICAL SETTINGS to Landsat-8
+            log.info("\nClipping to Alberta boundary...")
+            
+            # The boundary is rasterized once instead of evaluating the
+            # cutline polygon per output block on every warp
+            mask_path = build_alberta_mask()
+            mask_ds = gdal.Open(mask_path)
+            mask_bounds = bounds_from(mask_ds)
+            mask_srs_wkt = mask_ds.GetProjection()
+            mask_ds = None
+            
+            # Input pixels line up with the mask grid when the origins differ
+            # by a whole number of 30m pixels
+            x_offset = (gt[0] - mask_bounds[0]) / 30
+            y_offset = (gt[3] - mask_bounds[3]) / 30
+            grid_aligned = (
+                on_30m_grid
+                and abs(x_offset - round(x_offset)) < 1e-6
+                and abs(y_offset - round(y_offset)) < 1e-6
+            )
+            
+            source_vrt = f"/vsimem/{os.path.basename(output_path)}_source.vrt"
+            if grid_aligned:
+                # Aligned grids: a windowed copy of the cutline's bounding box
+                # gives byte-identical pixels without running the warp kernel
+                log.info("  Input aligned to the 30m grid - windowed copy, no resampling")
+                ds = gdal.Translate(
+                    source_vrt, input_path,
+                    format="VRT",
+                    projWin=[mask_bounds[0], mask_bounds[3], mask_bounds[2], mask_bounds[1]],
+                    noData=0
+                )
+                ds = None
+            else:
+                if not crs_ok:
+                    log.warning("  Input is not EPSG:3979 - reprojecting it onto the mask grid")
+                
+                # Lazy warp onto the mask grid (the cutline's bounding box). The bounds are
+                # in the mask's CRS, so the warp targets that CRS for non-3979 input too
+                warp_options = gdal.WarpOptions(
+                    format="VRT",
+                    outputBounds=mask_bounds,    # Same extent as cropToCutline=True
+                    dstSRS=mask_srs_wkt,
+                    dstNodata=0,                 # Same as Landsat-8
+                    resampleAlg='near',          # Same as Landsat-8
+                    # Preserve original resolution and CRS - IDENTICAL to Landsat-8
+                    xRes=30,  # 30m resolution - Same as Landsat-8
+                    yRes=30,  # 30m resolution - Same as Landsat-8
+                    targetAlignedPixels=False, # Same as Landsat-8 - Allows pixel boundaries to shift
+                    # Parallelize the warp kernel itself, not only compression
+                    multithread=True,
+                    warpOptions=[f"NUM_THREADS={num_threads}"],
+                    # Larger warp chunks - fewer subdivisions and source re-reads
+                    warpMemoryLimit=2 * 1024**3,  # 2 GB (-wm 2048)
+                    # Windowed warp: each VRT block is one block-aligned window
+                    creationOptions=[
+                        f"BLOCKXSIZE={warp_window_size}",
+                        f"BLOCKYSIZE={warp_window_size}"
+                    ]
+                )
+                
+                ds = gdal.Warp(source_vrt, input_path, options=warp_options)
+                ds = None
+            
+            # Background and dstNodata are both 0, so multiplying by the mask
+            # is equivalent to the polygon cutline
+            masked = build_masked_vrt(source_vrt, mask_path, band_type)
+            ds = gdal.Translate(output_path, masked, format="COG",
+                                creationOptions=creation_options,
+                                callback=gdal.TermProgress_nocb)
+            masked = None
+            gdal.Unlink(source_vrt)
         
         # Verify the output - IDENTICAL to Landsat-8
-        if os.path.exists(output_file):
+        # Metadata is read from the returned dataset, no second open needed
+        if ds is not None:
             # Get file info
-            ds = gdal.Open(output_file)
             width = ds.RasterXSize
             height = ds.RasterYSize
             gt = ds.GetGeoTransform()
-            proj = ds.GetProjection()
+            crs_ok = is_epsg_3979(ds)
             
             # Get band information
             raster_band = ds.GetRasterBand(1)
@@ -117,82 +409,103 @@ def clip_ground_truth():
             no_data = raster_band.GetNoDataValue()
             
             # Calculate bounds
-            minx = gt[0]
-            maxx = minx + width * gt[1]
-            maxy = gt[3]
-            miny = maxy + height * gt[5]
+            minx, miny, maxx, maxy = bounds_from(ds)
             
+            ds.FlushCache()
             ds = None
             
-            file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
+            write_dims_sidecar(output_path, width, height, gt, crs_ok)
+            
+            file_size_mb = os.stat(output_path).st_size / (1024 * 1024)
             
-            print(f"✓ SUCCESS: Ground truth label map clipped!")
-            print(f"  Output: {os.path.basename(output_file)}")
-            print(f"  Size: {width} x {height} pixels")
-            print(f"  Data type: {data_type}")
-            print(f"  NoData value: {no_data}")
-            print(f"  Resolution: {gt[1]:.2f} m")
-            print(f"  File size: {file_size_mb:.1f} MB")
-            print(f"  CRS preserved: {'3979' in proj}")
-            print(f"  Bounds X (m): {minx:.0f} to {maxx:.0f}")
-            print(f"  Bounds Y (m): {miny:.0f} to {maxy:.0f}")
-            print(f"  Width: {(maxx-minx)/1000:.1f} km")
-            print(f"  Height: {(maxy-miny)/1000:.1f} km")
+            log.info("✓ SUCCESS: %s clipped!", os.path.basename(input_path))
+            log.info("  Output: %s", os.path.basename(output_path))
+            log.info("  Size: %s x %s pixels", width, height)
+            log.info("  Data type: %s", data_type)
+            log.info("  NoData value: %s", no_data)
+            log.info("  Resolution: %.2f m", gt[1])
+            log.info("  File size: %.1f MB", file_size_mb)
+            log.info("  CRS preserved: %s", crs_ok)
+            log.info("  Bounds X (m): %.0f to %.0f", minx, maxx)
+            log.info("  Bounds Y (m): %.0f to %.0f", miny, maxy)
+            log.info("  Width: %.1f km", (maxx - minx) / 1000)
+            log.info("  Height: %.1f km", (maxy - miny) / 1000)
             
             return True
         else:
-            print(f"✗ ERROR: Output file was not created")
+            log.error("✗ ERROR: Output file was not created")
             return False
             
     except Exception as e:
-        print(f"✗ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("✗ ERROR: %s", e)
         return False
 
+def clip_many(jobs, max_workers=None):
+    """Clip single-band categorical (input, output) pairs in parallel, one process per raster"""
+    # clip_one masks and writes band 1 only, so a multi-band input would lose its other bands
+    accepted = []
+    for job in jobs:
+        ds = gdal.Open(job[0]) if os.path.exists(job[0]) else None
+        if ds is not None and ds.RasterCount != 1:
+            log.error("✗ Skipping %s: %s bands, batch clipping takes single-band label rasters",
+                      os.path.basename(job[0]), ds.RasterCount)
+        else:
+            accepted.append(job)
+        ds = None
+    jobs = accepted
+    if not jobs:
+        return []
+    
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 4) // 4)
+    # Keep total threads (workers x per-worker threads) within the core count
+    num_threads = "4" if max_workers > 1 else "ALL_CPUS"
+    cache_bytes = max(512 * 1024**2, 4 * 1024**3 // max_workers)
+    
+    # The mask is built once up front rather than raced by the workers
+    build_alberta_mask()
+    
+    inputs = [job[0] for job in jobs]
+    outputs = [job[1] for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        results = list(ex.map(clip_one, inputs, outputs,
+                              [num_threads] * len(jobs), [cache_bytes] * len(jobs)))
+    
+    log.info("\nBatch clip: %s/%s rasters clipped", sum(results), len(jobs))
+    return results
+
 # =====================================================
 # VERIFY COMPATIBILITY WITH OTHER DATASETS
 # =====================================================
 def verify_compatibility():
     """Verify that clipped ground truth is compatible with other datasets"""
-    print("\n" + "=" * 70)
-    print("VERIFYING COMPATIBILITY WITH OTHER DATASETS")
-    print("=" * 70)
+    log.info("\n" + "=" * 70)
+    log.info("VERIFYING COMPATIBILITY WITH OTHER DATASETS")
+    log.info("=" * 70)
     
     if not os.path.exists(output_file):
-        print("✗ Clipped ground truth not found. Please clip first.")
+        log.error("✗ Clipped ground truth not found. Please clip first.")
         return False
     
     # Load a sample Landsat-8 clipped band for comparison
     sample_landsat = r"D:\Alberta_L8_2020\Alberta_2020_NAD83_StatsCan_L8_30m_Mosaics_EPSG_3979_Clipped\Alberta_2020_L8_SR_B2_NAD83_StatsCan_CLIPPED.tif"
     
     if not os.path.exists(sample_landsat):
-        print("⚠️  Cannot find Landsat-8 sample for comparison")
-        print("   Please make sure Landsat-8 bands are clipped first.")
+        log.warning("⚠️  Cannot find Landsat-8 sample for comparison")
+        log.info("   Please make sure Landsat-8 bands are clipped first.")
         return True  # Continue anyway
     
     try:
-        # Open ground truth
-        gt_ds = gdal.Open(output_file)
-        gt_width = gt_ds.RasterXSize
-        gt_height = gt_ds.RasterYSize
-        gt_gt = gt_ds.GetGeoTransform()
-        gt_proj = gt_ds.GetProjection()
-        gt_ds = None
-        
-        # Open Landsat sample
-        ls_ds = gdal.Open(sample_landsat)
-        ls_width = ls_ds.RasterXSize
-        ls_height = ls_ds.RasterYSize
-        ls_gt = ls_ds.GetGeoTransform()
-        ls_proj = ls_ds.GetProjection()
-        ls_ds = None
+        # Geometry comes from the .dims.json sidecars written at clip time;
+        # the rasters are only opened when a sidecar is missing or stale
+        gt_width, gt_height, gt_gt, gt_crs_ok = read_dims(output_file)
+        ls_width, ls_height, ls_gt, ls_crs_ok = read_dims(sample_landsat)
         
-        print("Comparing ground truth with Landsat-8 band (SR_B2):")
-        print(f"  Ground Truth: {gt_width} x {gt_height} pixels")
-        print(f"  Landsat-8:    {ls_width} x {ls_height} pixels")
-        print(f"  Ground Truth resolution: {gt_gt[1]:.2f}m")
-        print(f"  Landsat-8 resolution:    {ls_gt[1]:.2f}m")
+        log.info("Comparing ground truth with Landsat-8 band (SR_B2):")
+        log.info("  Ground Truth: %s x %s pixels", gt_width, gt_height)
+        log.info("  Landsat-8:    %s x %s pixels", ls_width, ls_height)
+        log.info("  Ground Truth resolution: %.2fm", gt_gt[1])
+        log.info("  Landsat-8 resolution:    %.2fm", ls_gt[1])
         
         compatible = True
         issues = []
@@ -212,34 +525,40 @@ def verify_compatibility():
             compatible = False
         
         # Check CRS
-        if '3979' not in gt_proj:
+        if not gt_crs_ok:
             issues.append("Ground truth CRS not EPSG:3979")
             compatible = False
         
-        if '3979' not in ls_proj:
+        if not ls_crs_ok:
             issues.append("Landsat-8 CRS not EPSG:3979")
             compatible = False
         
         if compatible:
-            print("✓ Ground truth is compatible with Landsat-8 data")
-            print("  ✓ Same dimensions")
-            print("  ✓ Same resolution")
-            print("  ✓ Same CRS (EPSG:3979)")
+            log.info("✓ Ground truth is compatible with Landsat-8 data")
+            log.info("  ✓ Same dimensions")
+            log.info("  ✓ Same resolution")
+            log.info("  ✓ Same CRS (EPSG:3979)")
         else:
-            print("✗ WARNING: Compatibility issues detected!")
+            log.warning("✗ WARNING: Compatibility issues detected!")
             for issue in issues:
-                print(f"  - {issue}")
+                log.info("  - %s", issue)
         
         return compatible
         
     except Exception as e:
-        print(f"Error during compatibility check: {str(e)}")
+        log.error("Error during compatibility check: %s", e)
         return False
 
 # =====================================================
 # MAIN EXECUTION - SIMPLIFIED (SINGLE FILE)
 # =====================================================
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.environ.get("CLIP_LOG_LEVEL", "INFO").upper(),
+        format="%(message)s",
+        stream=sys.stdout
+    )
+    
     print("GROUND TRUTH LABEL MAP CLIPPING TOOL")
     print("=" * 70)
     print(f"Input file: {input_file}")
@@ -273,7 +592,7 @@ if __name__ == "__main__":
         print("  ✓ cropToCutline=True")
         print("  ✓ xRes=30, yRes=30")
         print("  ✓ resampleAlg='near'")
-        print("  ✓ COMPRESS=LZW, PREDICTOR=2")
+        print(f"  ✓ COMPRESS={gt_compression}")
         print("  ✓ targetAlignedPixels=False")
         print("  ✓ NoData value: 0")
         
@@ -281,6 +600,11 @@ if __name__ == "__main__":
         print("\nVerifying compatibility with other datasets...")
         verify_compatibility()
         
+        # Clip any additional rasters with the same settings, in parallel
+        if batch_jobs:
+            print(f"\nClipping {len(batch_jobs)} additional rasters in parallel...")
+            clip_many(batch_jobs)
+        
         print("\n" + "=" * 70)
         print("NEXT STEPS FOR LULC ANALYSIS:")
         print("=" * 70)
@@ -1,15 +1,84 @@
 # In this code, train, val, and test identical patches
 # are extracted from Landsat-8, Sentinel-2, and AlphaEarth images
 import numpy as np
-from osgeo import gdal, gdalconst, osr
+from numpy.lib.stride_tricks import sliding_window_view
+from osgeo import gdal, gdal_array, gdalconst, osr
 import os
 import math
+import multiprocessing
+import threading
+from collections import deque
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from tqdm import tqdm
-from numba import jit, prange
+try:
+    from numba import jit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Keep the module importable without Numba; the NumPy code paths are used instead
+    NUMBA_AVAILABLE = False
+    prange = range
+    def jit(*args, **kwargs):
+        return lambda func: func
+try:
+    from scipy.ndimage import uniform_filter
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 import warnings
 import json
 warnings.filterwarnings('ignore')
 
+# Multi-threaded block decoding/compression and a 4 GB block cache for every GDAL read
+gdal.SetConfigOption('GDAL_NUM_THREADS', 'ALL_CPUS')
+gdal.SetConfigOption('GDAL_CACHEMAX', '4096')
+
+# Extraction-only GDAL settings: direct (cache-bypassing) reads of multi-block windows from
+# uncompressed TIFFs and a 1 GB cache for the VSI file layer; 8 GB of block cache is shared
+# out between the extraction worker processes
+EXTRACTION_CACHE_MB = 8192
+EXTRACTION_GDAL_CONFIG = {
+    'GTIFF_DIRECT_IO': 'YES',
+    'VSI_CACHE': 'TRUE',
+    'VSI_CACHE_SIZE': '1000000000'
+}
+
+# Class scan and sensor checks of earlier runs, keyed by the modification times of their inputs
+SCAN_CACHE_FILE = '.scan_cache.json'
+
+# Per-class window counts of the filtered labels, (K, rows, cols) with index k = classes[k]
+ABUNDANCE_FILE = 'abundance.npy'
+ABUNDANCE_CLASSES_FILE = 'abundance_classes.json'
+
+# AlphaEarth embeddings in [-1, 1] are exported as uint8 by download_alphaearth_dataset.js
+# ((x + 1) / 2 * 255), so embedding = scale * (value - zero_point) for every band
+ALPHAEARTH_QUANTIZATION = {'scale': 2 / 255, 'zero_point': 127.5}
+
+# Read-only handles shared by every step, so each input goes through one dataset and block cache
+_DATASET_CACHE = {}
+
+def apply_gdal_settings(cache_mb, config):
+    """Set the block cache size and config options for the current process"""
+    gdal.SetCacheMax(cache_mb * 1024 * 1024)
+    for key, value in config.items():
+        gdal.SetConfigOption(key, value)
+
+def open_raster(path):
+    """Open (or reuse) a shared read-only raster with multi-threaded decoding of its compressed blocks"""
+    key = os.path.abspath(path)
+    ds = _DATASET_CACHE.get(key)
+    if ds is None:
+        ds = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY | gdal.OF_SHARED,
+                         open_options=['NUM_THREADS=ALL_CPUS'])
+        if ds is not None:
+            _DATASET_CACHE[key] = ds
+    return ds
+
 # Class definitions for Alberta
 CLASS_DEFINITIONS = {
     0: {'name': 'Unknown', 'color': (0, 0, 0)},
@@ -69,12 +138,47 @@ def create_alberta_label_mapping(alberta_classes):
     
     return original_to_new, new_to_original, new_class_definitions, alberta_classes_sorted
 
-def remap_ground_truth(input_path, output_path, label_mapping):
-    """Remap ground truth image using the label mapping"""
+def build_label_lut(label_mapping):
+    """Build a lookup table indexed by original class id (unmapped ids map to -99)"""
+    max_key = max(label_mapping)
+    lut = np.full(max_key + 1, -99, dtype=np.int16)
+    for original_class, new_label in label_mapping.items():
+        lut[original_class] = new_label
+    return lut
+
+def block_aligned_batch_size(band, batch_size):
+    """Round batch_size down to a multiple of the band's internal block size (at least one block)"""
+    block_x, block_y = band.GetBlockSize()
+    # Strip-organised rasters have full-width blocks: only their height matters
+    block = max(block_x if block_x < band.XSize else 1, block_y)
+    return max(block, (batch_size // block) * block)
+
+@jit(nopython=True, parallel=True)
+def apply_lut(data, lut, out):
+    """Numba-optimized LUT remap written in place into out (out-of-range ids -> -99)"""
+    rows, cols = data.shape
+    num_lut = lut.shape[0]
+    for i in prange(rows):
+        for j in range(cols):
+            v = data[i, j]
+            out[i, j] = lut[v] if 0 <= v < num_lut else -99
+    return out
+
+def remap_labels(data, lut, out):
+    """Remap a label window through the LUT into out (Numba kernel when available)"""
+    if NUMBA_AVAILABLE:
+        return apply_lut(data, lut, out)
+    # Values outside the LUT range (rare) become background
+    out[:] = np.where(data < lut.size, lut[np.clip(data, 0, lut.size - 1)], -99)
+    out[data < 0] = -99
+    return out
+
+def remap_ground_truth(input_path, output_path, lut, batch_size=2048):
+    """Remap ground truth image with a label LUT (see build_label_lut), streaming block-aligned windows"""
     print(f"Remapping ground truth labels...")
     
     # Open input file
-    src_ds = gdal.Open(input_path, gdal.GA_ReadOnly)
+    src_ds = open_raster(input_path)
     if src_ds is None:
         raise ValueError(f"Could not open input file: {input_path}")
     
@@ -83,76 +187,161 @@ def remap_ground_truth(input_path, output_path, label_mapping):
     cols = src_ds.RasterXSize
     gt = src_ds.GetGeoTransform()
     projection = src_ds.GetProjection()
-    
-    # Read data
     band = src_ds.GetRasterBand(1)
-    data = band.ReadAsArray()
     
-    # Create output array with remapped values
-    remapped_data = np.full_like(data, -99, dtype=np.int16)  # Default to background (-99)
+    # Each window is remapped with a single gather through the LUT
+    lut = np.asarray(lut, dtype=np.int16)
     
-    # Apply remapping using vectorized operations for speed
-    for original_class, new_label in label_mapping.items():
-        remapped_data[data == original_class] = new_label
-    
-    # Close input
-    src_ds = None
-    
-    # Create output file
+    # Create output file with 256x256 tiles and keep windows a multiple of both block grids
+    out_block = 256
+    batch_size = block_aligned_batch_size(band, batch_size)
+    batch_size = max(out_block, (batch_size // out_block) * out_block)
     driver = gdal.GetDriverByName('GTiff')
     out_ds = driver.Create(output_path, cols, rows, 1, gdal.GDT_Int16,
-                         options=['COMPRESS=LZW', 'TILED=YES'])
+                         options=['COMPRESS=LZW', 'TILED=YES',
+                                  f'BLOCKXSIZE={out_block}', f'BLOCKYSIZE={out_block}'])
     out_ds.SetGeoTransform(gt)
     out_ds.SetProjection(projection)
     out_band = out_ds.GetRasterBand(1)
-    out_band.WriteArray(remapped_data)
     out_band.SetNoDataValue(-99)
     
-    # Close output
+    # Stream the raster window by window so peak memory stays at one window
+    remap_buffer = np.empty((batch_size, batch_size), dtype=np.int16)
+    for y_start in tqdm(range(0, rows, batch_size), desc="Remapping batches"):
+        y_size = min(batch_size, rows - y_start)
+        for x_start in range(0, cols, batch_size):
+            x_size = min(batch_size, cols - x_start)
+            data = band.ReadAsArray(x_start, y_start, x_size, y_size)
+            if data is None:
+                continue
+            
+            remapped_data = remap_labels(data, lut, remap_buffer[:y_size, :x_size])
+            out_band.WriteArray(remapped_data, x_start, y_start)
+    
+    # Close input and output
     out_ds.FlushCache()
-    out_ds = None
+    src_ds = out_ds = None
     
     print(f"  Remapped ground truth saved to: {output_path}")
     return output_path
 
 @jit(nopython=True, parallel=True)
-def apply_strict_majority_filter_numba(lc_array, min_homogeneity=0.8):
+def apply_strict_majority_filter_numba(lc_array, min_homogeneity=0.8,
+                                       core_y_start=0, core_y_end=-1, core_x_start=0, core_x_end=-1):
     """Numba-optimized strict majority filter that ignores background (-99) values"""
+    # Returns (filtered, removed, processed); counters cover only the core region so
+    # batch overlaps are not double counted (an end of -1 means the full array)
     rows, cols = lc_array.shape
     filtered = np.full_like(lc_array, -99)  # Use -99 for background
     kernel_size = 9
     half_kernel = kernel_size // 2
     min_required = math.ceil(kernel_size**2 * min_homogeneity)
-    
+    if core_y_end < 0:
+        core_y_end = rows
+    if core_x_end < 0:
+        core_x_end = cols
+    
+    pixels_removed = 0
+    pixels_processed = 0
+    
+    max_class = lc_array.max()
+    if max_class < 0:  # Background-only batch
+        return filtered, pixels_removed, pixels_processed
+    
+    # Each row keeps its own class histogram of the 9x9 window and slides it along x
+    # (add the entering column, drop the leaving one): O(kernel) work per pixel, independent
+    # of the number of classes. min_homogeneity > 0.5 makes the pixel's own class the only
+    # possible winner, so its bin is checked directly instead of taking an argmax.
     for i in prange(rows):
+        y_start = max(0, i - half_kernel)
+        y_end = min(rows, i + half_kernel + 1)
+        hist = np.zeros(max_class + 1, dtype=np.int32)
+        
+        # Prime with columns [0, half_kernel); the loop adds column j + half_kernel as it enters
+        for x in range(min(cols, half_kernel)):
+            for y in range(y_start, y_end):
+                value = lc_array[y,x]
+                if value >= 0:
+                    hist[value] += 1
+        
         for j in range(cols):
-            current_val = lc_array[i,j]
-            if current_val == -99:  # Skip background
-                filtered[i,j] = -99
-                continue
-                
-            # Get window bounds
-            y_start = max(0, i - half_kernel)
-            y_end = min(rows, i + half_kernel + 1)
-            x_start = max(0, j - half_kernel)
-            x_end = min(cols, j + half_kernel + 1)
+            x_in = j + half_kernel
+            if x_in < cols:
+                for y in range(y_start, y_end):
+                    value = lc_array[y,x_in]
+                    if value >= 0:
+                        hist[value] += 1
+            x_out = j - half_kernel - 1
+            if x_out >= 0:
+                for y in range(y_start, y_end):
+                    value = lc_array[y,x_out]
+                    if value >= 0:
+                        hist[value] -= 1
             
-            # Count occurrences of current class (ignoring background)
-            count = 0
-            for y in range(y_start, y_end):
-                for x in range(x_start, x_end):
-                    if lc_array[y,x] == current_val and lc_array[y,x] != -99:
-                        count += 1
+            class_id = lc_array[i,j]
+            if class_id < 0:
+                continue
+            keep = hist[class_id] >= min_required
+            if keep:
+                filtered[i,j] = class_id
             
-            # Only keep if meets homogeneity threshold
-            filtered[i,j] = current_val if count >= min_required else -99
+            # Statistics are reduced here while the pixel is already loaded
+            if core_y_start <= i < core_y_end and core_x_start <= j < core_x_end:
+                pixels_processed += 1
+                if not keep:
+                    pixels_removed += 1
     
-    return filtered
+    return filtered, pixels_removed, pixels_processed
+
+def apply_strict_majority_filter_numpy(lc_array, min_homogeneity=0.8,
+                                       core_y_start=0, core_y_end=-1, core_x_start=0, core_x_end=-1,
+                                       strip_rows=256):
+    """Vectorized strict majority filter (reference and fallback when Numba is unavailable)"""
+    # Same inputs and outputs as apply_strict_majority_filter_numba; uses SciPy box filters when installed
+    rows, cols = lc_array.shape
+    kernel_size = 9
+    half_kernel = kernel_size // 2
+    min_required = math.ceil(kernel_size**2 * min_homogeneity)
+    if core_y_end < 0:
+        core_y_end = rows
+    if core_x_end < 0:
+        core_x_end = cols
+    
+    filtered = np.full_like(lc_array, -99)
+    
+    if SCIPY_AVAILABLE:
+        # Separable C box filter per class; zero padding matches the kernel's clipped windows
+        for class_id in range(max(int(lc_array.max()), -1) + 1):
+            mask = lc_array == class_id
+            if not mask.any():
+                continue
+            frac = uniform_filter(mask.astype(np.float32), size=kernel_size, mode='constant')
+            counts = np.rint(frac * kernel_size**2)
+            filtered[mask & (counts >= min_required)] = class_id
+    else:
+        # Pad with background so edge windows behave like the clipped windows of the kernel
+        padded = np.pad(lc_array, half_kernel, constant_values=-99)
+        
+        # Row strips bound the (strip, cols, 9, 9) comparison to a few tens of MB
+        for y_start in range(0, rows, strip_rows):
+            y_end = min(rows, y_start + strip_rows)
+            windows = sliding_window_view(padded[y_start:y_end + 2 * half_kernel], (kernel_size, kernel_size))
+            center = lc_array[y_start:y_end]
+            counts = (windows == center[:, :, None, None]).sum(axis=(-1, -2))
+            keep = (center != -99) & (counts >= min_required)
+            filtered[y_start:y_end] = np.where(keep, center, -99)
+    
+    core_original = lc_array[core_y_start:core_y_end, core_x_start:core_x_end]
+    core_filtered = filtered[core_y_start:core_y_end, core_x_start:core_x_end]
+    pixels_processed = int(np.count_nonzero(core_original != -99))
+    pixels_removed = pixels_processed - int(np.count_nonzero(core_filtered != -99))
+    
+    return filtered, pixels_removed, pixels_processed
 
 def apply_strict_majority_filter_batched(input_path, output_path, min_homogeneity=0.8, batch_size=2048):
     """Memory-optimized strict majority filter using batch processing"""
     print("Loading remapped land cover data for strict filtering...")
-    src_ds = gdal.Open(input_path)
+    src_ds = open_raster(input_path)
     
     # Get dimensions and metadata
     rows = src_ds.RasterYSize
@@ -169,12 +358,20 @@ def apply_strict_majority_filter_batched(input_path, output_path, min_homogeneit
     out_band = out_ds.GetRasterBand(1)
     out_band.SetNoDataValue(-99)
     
+    # Batch cores start on source block boundaries so each tile is decoded once
+    band = src_ds.GetRasterBand(1)
+    batch_size = block_aligned_batch_size(band, batch_size)
+    
     # Process in batches with overlap for edge handling
     kernel_size = 9
     overlap = kernel_size // 2
     
     print(f"Processing in batches of {batch_size}x{batch_size} with {overlap} pixel overlap...")
     
+    # Numba kernel when available, otherwise the vectorized NumPy version
+    majority_filter = (apply_strict_majority_filter_numba if NUMBA_AVAILABLE
+                       else apply_strict_majority_filter_numpy)
+    
     # Track statistics
     total_pixels_removed = 0
     total_pixels_processed = 0
@@ -198,7 +395,7 @@ def apply_strict_majority_filter_batched(input_path, output_path, min_homogeneit
             x_end_read = min(cols, x_end + overlap)
             
             # Read batch with overlap
-            batch_array = src_ds.GetRasterBand(1).ReadAsArray(
+            batch_array = band.ReadAsArray(
                 x_start_read, y_start_read, 
                 x_end_read - x_start_read, 
                 y_end_read - y_start_read
@@ -207,21 +404,19 @@ def apply_strict_majority_filter_batched(input_path, output_path, min_homogeneit
             if batch_array is None:
                 continue
                 
-            # Apply filter to batch
-            filtered_batch = apply_strict_majority_filter_numba(batch_array, min_homogeneity)
-            
-            # Extract the core region (without overlap) for writing
+            # Core region (without overlap) for writing and statistics
             core_y_start = y_start - y_start_read
             core_y_end = core_y_start + (y_end - y_start)
             core_x_start = x_start - x_start_read
             core_x_end = core_x_start + (x_end - x_start)
             
+            # Apply filter to batch; the kernel also counts removed/processed core pixels
+            filtered_batch, pixels_removed, pixels_processed = majority_filter(
+                batch_array, min_homogeneity, core_y_start, core_y_end, core_x_start, core_x_end)
+            
             core_filtered = filtered_batch[core_y_start:core_y_end, core_x_start:core_x_end]
-            core_original = batch_array[core_y_start:core_y_end, core_x_start:core_x_end]
             
             # Update statistics (ignore background pixels)
-            pixels_removed = np.sum((core_original != -99) & (core_filtered == -99))
-            pixels_processed = np.sum(core_original != -99)
             total_pixels_removed += pixels_removed
             total_pixels_processed += pixels_processed
             
@@ -237,50 +432,45 @@ def apply_strict_majority_filter_batched(input_path, output_path, min_homogeneit
     
     return output_path
 
-@jit(nopython=True)
-def calculate_abundance_batch_numba(lc_batch, class_id, window_size, stride, 
-                                   batch_start_y, batch_start_x, out_rows, out_cols):
-    """Numba-optimized abundance calculation for a batch"""
-    lc_rows, lc_cols = lc_batch.shape
-    
-    # Calculate which abundance cells this batch affects
-    start_i = max(0, batch_start_y // stride)
-    end_i = min(out_rows, (batch_start_y + lc_rows) // stride + 1)
-    start_j = max(0, batch_start_x // stride)  
-    end_j = min(out_cols, (batch_start_x + lc_cols) // stride + 1)
-    
-    abundance = np.zeros((end_i - start_i, end_j - start_j), dtype=np.int32)
-    
-    for i in range(start_i, end_i):
-        for j in range(start_j, end_j):
-            # Convert to original image coordinates
-            y_start_orig = i * stride
-            x_start_orig = j * stride
-            y_end_orig = min(y_start_orig + window_size, batch_start_y + lc_rows)
-            x_end_orig = min(x_start_orig + window_size, batch_start_x + lc_cols)
-            
-            # Convert to batch coordinates
-            y_start_batch = max(0, y_start_orig - batch_start_y)
-            x_start_batch = max(0, x_start_orig - batch_start_x)
-            y_end_batch = min(lc_rows, y_end_orig - batch_start_y)
-            x_end_batch = min(lc_cols, x_end_orig - batch_start_x)
-            
-            if (y_start_batch < y_end_batch and x_start_batch < x_end_batch):
-                window = lc_batch[y_start_batch:y_end_batch, x_start_batch:x_end_batch]
-                abundance[i - start_i, j - start_j] = np.sum(window == class_id)
+def build_class_planes(lc_tile, class_ids):
+    """Per-class boolean planes (K, h, w) of a land cover tile, built once in one broadcast pass"""
+    class_ids = np.asarray(class_ids, dtype=lc_tile.dtype)
+    return lc_tile[np.newaxis, :, :] == class_ids[:, np.newaxis, np.newaxis]
+
+def calculate_abundance_tile(class_planes, window_size, stride, n_rows, n_cols):
+    """Window counts for every class plane of a stride-aligned tile using summed-area tables"""
+    num_classes, tile_rows, tile_cols = class_planes.shape
+    
+    # Window corners of each output cell in tile coordinates (clipped for rasters smaller than a window)
+    ys0 = np.arange(n_rows) * stride
+    ys1 = np.minimum(ys0 + window_size, tile_rows)
+    xs0 = np.arange(n_cols) * stride
+    xs1 = np.minimum(xs0 + window_size, tile_cols)
+    
+    abundance = np.zeros((num_classes, n_rows, n_cols), dtype=np.int32)
+    integral = np.zeros((tile_rows + 1, tile_cols + 1), dtype=np.int32)
+    for idx in range(num_classes):
+        plane = class_planes[idx]
+        if not plane.any():  # Class absent from this tile: counts stay zero
+            continue
+        
+        # Two cumulative-sum passes of the class plane, then four corner lookups per cell
+        np.cumsum(plane, axis=0, dtype=np.int32, out=integral[1:, 1:])
+        np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+        abundance[idx] = (integral[np.ix_(ys1, xs1)] - integral[np.ix_(ys0, xs1)]
+                          - integral[np.ix_(ys1, xs0)] + integral[np.ix_(ys0, xs0)])
     
-    return abundance, start_i, start_j
+    return abundance
 
-def create_abundance_maps_batched(lc_path, output_dir, window_size=224, overlap=20, batch_size=2048):
-    """Create abundance maps for each class using batch processing"""
+def create_abundance_maps_batched(lc_path, output_dir, window_size=224, overlap=20, batch_size=2048,
+                                  known_classes=None, write_files=True):
+    """Create abundance maps for each class using batch processing (known_classes skips the class scan)"""
     os.makedirs(output_dir, exist_ok=True)
     
     # Open dataset
-    src_ds = gdal.Open(lc_path)
+    src_ds = open_raster(lc_path)
     rows = src_ds.RasterYSize
     cols = src_ds.RasterXSize
-    gt = src_ds.GetGeoTransform()
-    projection = src_ds.GetProjection()
     
     print(f"Land cover dimensions: {rows} x {cols}")
     print(f"Window size: {window_size}, Overlap: {overlap}")
@@ -294,54 +484,21 @@ def create_abundance_maps_batched(lc_path, output_dir, window_size=224, overlap=
     
     print(f"Abundance map dimensions: {out_rows} x {out_cols}")
     
-    # Adjust geotransform for output
-    out_gt = list(gt)
-    out_gt[1] = gt[1] * stride
-    out_gt[5] = gt[5] * stride
-    
-    # Get classes by scanning in batches (ignore background -99)
-    print("Scanning for unique classes...")
-    classes = set()
+    # Class-scan batches follow the source block grid
+    band = src_ds.GetRasterBand(1)
+    batch_size = block_aligned_batch_size(band, batch_size)
     num_batches_y = math.ceil(rows / batch_size)
     num_batches_x = math.ceil(cols / batch_size)
     
-    for batch_y in range(num_batches_y):
-        for batch_x in range(num_batches_x):
-            y_start = batch_y * batch_size
-            y_end = min((batch_y + 1) * batch_size, rows)
-            x_start = batch_x * batch_size
-            x_end = min((batch_x + 1) * batch_size, cols)
-            
-            batch_array = src_ds.GetRasterBand(1).ReadAsArray(x_start, y_start, 
-                                                             x_end - x_start, y_end - y_start)
-            if batch_array is not None:
-                batch_classes = np.unique(batch_array)
-                # Filter out background (-99) and keep only valid classes
-                valid_classes = batch_classes[(batch_classes != -99)]
-                classes.update(valid_classes)
-    
-    classes = sorted([int(c) for c in classes])
-    print(f"Found {len(classes)} classes after remapping: {classes}")
-    
-    # Process each class
-    for class_id in tqdm(classes, desc="Creating abundance maps"):
-        abundance_path = os.path.join(output_dir, f"class_{class_id}_abundance.tif")
-        
-        # Skip if already exists
-        if os.path.exists(abundance_path):
-            continue
-            
-        driver = gdal.GetDriverByName('GTiff')
-        out_ds = driver.Create(abundance_path, out_cols, out_rows, 1, gdal.GDT_Int32,
-                             options=['COMPRESS=LZW', 'TILED=YES'])
-        out_ds.SetGeoTransform(out_gt)
-        out_ds.SetProjection(projection)
-        out_band = out_ds.GetRasterBand(1)
-        out_band.SetNoDataValue(-9999)
-        
-        full_abundance = np.zeros((out_rows, out_cols), dtype=np.int32)
+    if known_classes is not None:
+        # Labels are already known from the label mapping, no need to re-read the raster
+        classes = sorted(int(c) for c in known_classes if c != -99)
+        print(f"Using {len(classes)} known classes: {classes}")
+    else:
+        # Get classes by scanning in batches (ignore background -99)
+        print("Scanning for unique classes...")
+        classes = set()
         
-        # Process in batches
         for batch_y in range(num_batches_y):
             for batch_x in range(num_batches_x):
                 y_start = batch_y * batch_size
@@ -349,37 +506,223 @@ def create_abundance_maps_batched(lc_path, output_dir, window_size=224, overlap=
                 x_start = batch_x * batch_size
                 x_end = min((batch_x + 1) * batch_size, cols)
                 
-                batch_array = src_ds.GetRasterBand(1).ReadAsArray(x_start, y_start,
-                                                                 x_end - x_start, y_end - y_start)
+                batch_array = band.ReadAsArray(x_start, y_start, x_end - x_start, y_end - y_start)
+                if batch_array is not None:
+                    batch_classes = np.unique(batch_array)
+                    # Filter out background (-99) and keep only valid classes
+                    valid_classes = batch_classes[(batch_classes != -99)]
+                    classes.update(valid_classes)
+        
+        classes = sorted([int(c) for c in classes])
+        print(f"Found {len(classes)} classes after remapping: {classes}")
+    
+    # All classes share one (K, rows, cols) array memory-mapped from abundance.npy (index k = classes[k])
+    shape = (len(classes), out_rows, out_cols)
+    dtype = abundance_dtype(window_size)
+    full_abundance = load_abundance_array(output_dir, classes, shape, dtype) if classes else None
+    
+    if full_abundance is not None:
+        print(f"  Abundance maps already exist: {os.path.join(output_dir, ABUNDANCE_FILE)}")
+    elif classes:
+        if write_files:
+            full_abundance = create_abundance_array(output_dir, shape, dtype)
+        else:
+            full_abundance = np.zeros(shape, dtype=dtype)
+        
+        # Tiles hold whole output cells plus the window overhang, so every window is complete
+        # inside one tile and nothing has to be summed across batch borders
+        cells_per_tile = max(1, batch_size // stride)
+        for i_start in tqdm(range(0, out_rows, cells_per_tile), desc="Creating abundance maps"):
+            i_end = min(out_rows, i_start + cells_per_tile)
+            y_start = i_start * stride
+            y_end = min(rows, (i_end - 1) * stride + window_size)
+            for j_start in range(0, out_cols, cells_per_tile):
+                j_end = min(out_cols, j_start + cells_per_tile)
+                x_start = j_start * stride
+                x_end = min(cols, (j_end - 1) * stride + window_size)
                 
-                if batch_array is None:
+                tile = band.ReadAsArray(x_start, y_start, x_end - x_start, y_end - y_start)
+                if tile is None or tile.max() < 0:  # Background-only tile: counts stay zero
                     continue
                 
-                # Calculate abundance for this batch
-                batch_abundance, start_i, start_j = calculate_abundance_batch_numba(
-                    batch_array, class_id, window_size, stride, y_start, x_start, out_rows, out_cols
-                )
-                
-                # Add to full abundance map
-                end_i = start_i + batch_abundance.shape[0]
-                end_j = start_j + batch_abundance.shape[1]
-                if end_i <= out_rows and end_j <= out_cols:
-                    full_abundance[start_i:end_i, start_j:end_j] += batch_abundance
+                # Class planes are derived once per tile and shared by every class count
+                class_planes = build_class_planes(tile, classes)
+                full_abundance[:, i_start:i_end, j_start:j_end] = calculate_abundance_tile(
+                    class_planes, window_size, stride, i_end - i_start, j_end - j_start)
         
-        # Write abundance map
-        out_band.WriteArray(full_abundance)
-        out_ds.FlushCache()
-        out_ds = None
+        # Kept on disk for inspection and re-runs
+        if write_files:
+            finalize_abundance_array(full_abundance, output_dir, classes)
+    
+    # Per-class maps are contiguous views into the shared array
+    abundance_maps = {}
+    if full_abundance is not None:
+        abundance_maps = {class_id: full_abundance[k] for k, class_id in enumerate(classes)}
     
     src_ds = None
-    return classes, stride, rows, cols
+    return classes, stride, rows, cols, abundance_maps
+
+def abundance_dtype(window_size):
+    """Smallest unsigned integer type that holds a full-window pixel count"""
+    return np.uint16 if window_size * window_size <= np.iinfo(np.uint16).max else np.uint32
+
+def create_abundance_array(abundance_dir, shape, dtype):
+    """Zero-filled (K, rows, cols) abundance array backed by a writable abundance.npy memmap"""
+    # Drop the class list first so an interrupted run is never mistaken for a finished one
+    classes_path = os.path.join(abundance_dir, ABUNDANCE_CLASSES_FILE)
+    if os.path.exists(classes_path):
+        os.remove(classes_path)
+    return np.lib.format.open_memmap(os.path.join(abundance_dir, ABUNDANCE_FILE),
+                                     mode='w+', dtype=dtype, shape=shape)
+
+def finalize_abundance_array(full_abundance, abundance_dir, classes):
+    """Flush the abundance memmap and record its class order next to it"""
+    full_abundance.flush()
+    with open(os.path.join(abundance_dir, ABUNDANCE_CLASSES_FILE), 'w') as f:
+        json.dump([int(c) for c in classes], f)
+
+def load_abundance_array(abundance_dir, classes, shape, dtype):
+    """Memory-map a finished abundance.npy read-only if it matches the classes and grid, else None"""
+    npy_path = os.path.join(abundance_dir, ABUNDANCE_FILE)
+    classes_path = os.path.join(abundance_dir, ABUNDANCE_CLASSES_FILE)
+    if not (os.path.exists(npy_path) and os.path.exists(classes_path)):
+        return None
+    with open(classes_path, 'r') as f:
+        saved_classes = json.load(f)
+    full_abundance = np.load(npy_path, mmap_mode='r')
+    if saved_classes != list(classes) or full_abundance.shape != shape or full_abundance.dtype != dtype:
+        return None
+    return full_abundance
 
-def select_and_split_patches_stratified(abundance_dir, classes, lc_rows, lc_cols, 
+def process_landcover_streaming(lc_path, lut, known_classes, filtered_path, abundance_dir,
+                                window_size=224, overlap=20, min_homogeneity=0.8, batch_size=2048,
+                                remapped_path=None):
+    """Remap, majority-filter and count class abundance in a single pass over the land cover tiles"""
+    # Same outputs as remap_ground_truth + apply_strict_majority_filter_batched +
+    # create_abundance_maps_batched, but each source tile is read and decoded once
+    os.makedirs(abundance_dir, exist_ok=True)
+    
+    src_ds = open_raster(lc_path)
+    if src_ds is None:
+        raise ValueError(f"Could not open input file: {lc_path}")
+    rows = src_ds.RasterYSize
+    cols = src_ds.RasterXSize
+    gt = src_ds.GetGeoTransform()
+    projection = src_ds.GetProjection()
+    band = src_ds.GetRasterBand(1)
+    lut = np.asarray(lut, dtype=np.int16)
+    classes = sorted(int(c) for c in known_classes if c != -99)
+    
+    # Abundance grid, as in create_abundance_maps_batched
+    stride = window_size - overlap
+    out_rows = max(1, (max(0, rows - window_size) // stride) + 1)
+    out_cols = max(1, (max(0, cols - window_size) // stride) + 1)
+    
+    print(f"Land cover dimensions: {rows} x {cols}")
+    print(f"Abundance map dimensions: {out_rows} x {out_cols} ({len(classes)} classes)")
+    
+    driver = gdal.GetDriverByName('GTiff')
+    
+    def create_label_raster(path):
+        out_ds = driver.Create(path, cols, rows, 1, gdal.GDT_Int16,
+                             options=['COMPRESS=LZW', 'TILED=YES'])
+        out_ds.SetGeoTransform(gt)
+        out_ds.SetProjection(projection)
+        out_ds.GetRasterBand(1).SetNoDataValue(-99)
+        return out_ds
+    
+    # Written under temporary names and renamed once the abundance is finalized: main() skips this
+    # pass whenever LC_filtered.tif exists, so an interrupted run must not leave it behind
+    filtered_ds = create_label_raster(filtered_path + '.partial')
+    remapped_ds = create_label_raster(remapped_path + '.partial') if remapped_path else None
+    filtered_band = filtered_ds.GetRasterBand(1)
+    remapped_band = remapped_ds.GetRasterBand(1) if remapped_ds is not None else None
+    
+    def tile_span(cell_start, cell_end, num_cells, size):
+        # Pixels this tile owns (written once) and the end of its last abundance window
+        own_start = cell_start * stride
+        own_end = size if cell_end == num_cells else cell_end * stride
+        window_end = min(size, (cell_end - 1) * stride + window_size)
+        return own_start, own_end, window_end
+    
+    # Tiles are whole abundance cells; reads add the filter halo around the owned pixels and the
+    # window overhang so filtered values, writes and window counts are all exact inside one tile
+    halo = 9 // 2
+    cells_per_tile = max(1, batch_size // stride)
+    majority_filter = (apply_strict_majority_filter_numba if NUMBA_AVAILABLE
+                       else apply_strict_majority_filter_numpy)
+    full_abundance = create_abundance_array(abundance_dir, (len(classes), out_rows, out_cols),
+                                            abundance_dtype(window_size))
+    total_pixels_removed = 0
+    total_pixels_processed = 0
+    
+    for i_start in tqdm(range(0, out_rows, cells_per_tile), desc="Processing land cover tiles"):
+        i_end = min(out_rows, i_start + cells_per_tile)
+        y_own, y_own_end, y_window_end = tile_span(i_start, i_end, out_rows, rows)
+        y_read = max(0, y_own - halo)
+        y_read_end = min(rows, max(y_own_end, y_window_end) + halo)
+        for j_start in range(0, out_cols, cells_per_tile):
+            j_end = min(out_cols, j_start + cells_per_tile)
+            x_own, x_own_end, x_window_end = tile_span(j_start, j_end, out_cols, cols)
+            x_read = max(0, x_own - halo)
+            x_read_end = min(cols, max(x_own_end, x_window_end) + halo)
+            
+            data = band.ReadAsArray(x_read, y_read, x_read_end - x_read, y_read_end - y_read)
+            if data is None:
+                continue
+            
+            # Owned region in tile coordinates
+            core_y_start = y_own - y_read
+            core_y_end = y_own_end - y_read
+            core_x_start = x_own - x_read
+            core_x_end = x_own_end - x_read
+            
+            remapped = remap_labels(data, lut, np.empty(data.shape, dtype=np.int16))
+            has_labels = remapped.max() >= 0
+            if has_labels:
+                filtered, pixels_removed, pixels_processed = majority_filter(
+                    remapped, min_homogeneity, core_y_start, core_y_end, core_x_start, core_x_end)
+                total_pixels_removed += pixels_removed
+                total_pixels_processed += pixels_processed
+            else:
+                # Background-only tile (outside the Alberta clip): filtered output is background too
+                filtered = remapped
+            
+            filtered_band.WriteArray(
+                filtered[core_y_start:core_y_end, core_x_start:core_x_end], x_own, y_own)
+            if remapped_band is not None:
+                remapped_band.WriteArray(
+                    remapped[core_y_start:core_y_end, core_x_start:core_x_end], x_own, y_own)
+            
+            # Window counts on the filtered labels, starting at the owned origin (zero without labels)
+            if classes and has_labels:
+                window_tile = filtered[core_y_start:y_window_end - y_read, core_x_start:x_window_end - x_read]
+                full_abundance[:, i_start:i_end, j_start:j_end] = calculate_abundance_tile(
+                    build_class_planes(window_tile, classes), window_size, stride,
+                    i_end - i_start, j_end - j_start)
+    
+    print(f"Removed {total_pixels_removed:,} non-homogeneous pixels ({total_pixels_removed/max(total_pixels_processed,1):.1%})")
+    
+    filtered_ds.FlushCache()
+    filtered_band = filtered_ds = None
+    if remapped_ds is not None:
+        remapped_ds.FlushCache()
+        remapped_band = remapped_ds = None
+    src_ds = None
+    
+    finalize_abundance_array(full_abundance, abundance_dir, classes)
+    if remapped_path:
+        os.replace(remapped_path + '.partial', remapped_path)
+    os.replace(filtered_path + '.partial', filtered_path)
+    abundance_maps = {class_id: full_abundance[k] for k, class_id in enumerate(classes)}
+    
+    return classes, stride, rows, cols, abundance_maps
+
+def select_and_split_patches_stratified(abundance_maps, classes, lc_rows, lc_cols, 
                                       window_size, stride, min_patches_per_class=100,
-                                      train_ratio=0.7, val_ratio=0.15):
-    """Select patches with stratified sampling and split into train/val/test"""
-    import heapq
-    import random
+                                      train_ratio=0.7, val_ratio=0.15, seed=None):
+    """Select patches with stratified sampling and split into train/val/test (seed makes splits reproducible)"""
+    rng = np.random.default_rng(seed)
     
     print(f"Selecting patches with min {min_patches_per_class} per class")
     print(f"Split ratios: Train={train_ratio:.0%}, Val={val_ratio:.0%}, Test={1-train_ratio-val_ratio:.0%}")
@@ -391,62 +734,48 @@ def select_and_split_patches_stratified(abundance_dir, classes, lc_rows, lc_cols
     }
     
     for class_id in tqdm(classes, desc="Selecting patches by class"):
-        path = os.path.join(abundance_dir, f"class_{class_id}_abundance.tif")
-        ds = gdal.Open(path)
+        abundance = abundance_maps.get(class_id)
         
-        if ds is None:
+        if abundance is None:
             all_splits['train'][class_id] = []
             all_splits['val'][class_id] = []
             all_splits['test'][class_id] = []
             continue
         
-        rows = ds.RasterYSize
-        cols = ds.RasterXSize
-        
-        # Collect all valid patches
-        all_patches = []
-        chunk_size = 500
-        
-        for i_start in range(0, rows, chunk_size):
-            i_end = min(i_start + chunk_size, rows)
-            chunk = ds.GetRasterBand(1).ReadAsArray(0, i_start, cols, i_end - i_start)
-            
-            if chunk is None:
-                continue
-                
-            for local_i in range(chunk.shape[0]):
-                for j in range(chunk.shape[1]):
-                    abundance_val = chunk[local_i, j]
-                    i = i_start + local_i
-                    
-                    if abundance_val > 0:
-                        y_start = i * stride
-                        x_start = j * stride
-                        
-                        if (y_start + window_size <= lc_rows and 
-                            x_start + window_size <= lc_cols):
-                            
-                            all_patches.append((abundance_val, i, j))
-        
-        ds = None
+        # Only cells whose window fits inside the land cover raster (a leading block of the map)
+        abundance = abundance[:max(0, (lc_rows - window_size) // stride + 1),
+                              :max(0, (lc_cols - window_size) // stride + 1)]
         
-        # Sort by abundance and take top patches
-        all_patches.sort(key=lambda x: x[0], reverse=True)
-        available_patches = len(all_patches)
-        patches_to_select = min(available_patches, min_patches_per_class)
+        # Take the top cells straight from the flat map (partial selection, no full sort): every
+        # cell above the K-th abundance, then the cells tied with it in row-major order, as the
+        # stable descending sort did; cells without any pixel of the class are never patches
+        flat = abundance.ravel()
+        patches_to_select = min(flat.size, min_patches_per_class)
+        if patches_to_select:
+            kth = np.partition(flat, -patches_to_select)[-patches_to_select]
+            above = np.flatnonzero(flat > kth)
+            tied = np.flatnonzero(flat == kth)[:patches_to_select - above.size]
+            top = np.concatenate((above, tied))
+        else:
+            top = np.empty(0, dtype=np.intp)
+        top = top[flat[top] > 0]
         
-        if patches_to_select == 0:
+        if top.size == 0:
             all_splits['train'][class_id] = []
             all_splits['val'][class_id] = []
             all_splits['test'][class_id] = []
             print(f"Class {class_id}: No patches available")
             continue
         
-        selected_patches = all_patches[:patches_to_select]
-        random.shuffle(selected_patches)
+        # Order the selected few by abundance descending, then row-major position, before the shuffle
+        top = top[np.lexsort((top, -flat[top].astype(np.int64)))]
+        
+        # Shuffle with one index permutation, then back to (row, col) cells
+        top = top[rng.permutation(top.size)]
+        sel_i, sel_j = np.unravel_index(top, abundance.shape)
         
         # Split into train/val/test
-        n_patches = len(selected_patches)
+        n_patches = top.size
         n_train = int(n_patches * train_ratio)
         n_val = int(n_patches * val_ratio)
         n_test = n_patches - n_train - n_val
@@ -459,9 +788,9 @@ def select_and_split_patches_stratified(abundance_dir, classes, lc_rows, lc_cols
             n_train -= 1
             n_val = 1
         
-        train_patches = [(i, j) for _, i, j in selected_patches[:n_train]]
-        val_patches = [(i, j) for _, i, j in selected_patches[n_train:n_train + n_val]]
-        test_patches = [(i, j) for _, i, j in selected_patches[n_train + n_val:]]
+        train_patches = list(zip(sel_i[:n_train].tolist(), sel_j[:n_train].tolist()))
+        val_patches = list(zip(sel_i[n_train:n_train + n_val].tolist(), sel_j[n_train:n_train + n_val].tolist()))
+        test_patches = list(zip(sel_i[n_train + n_val:].tolist(), sel_j[n_train + n_val:].tolist()))
         
         all_splits['train'][class_id] = train_patches
         all_splits['val'][class_id] = val_patches
@@ -471,14 +800,30 @@ def select_and_split_patches_stratified(abundance_dir, classes, lc_rows, lc_cols
     
     return all_splits
 
+def sorted_patch_jobs(patch_locations, cells_per_tile):
+    """Flatten patch locations into (class_id, patch_idx, i, j) jobs grouped by super-tile"""
+    # patch_idx keeps the original per-class numbering used in the file names
+    jobs = [(class_id, patch_idx, i, j)
+            for class_id, coords in patch_locations.items()
+            for patch_idx, (i, j) in enumerate(coords)]
+    # Super-tiles in row-major order, raster order inside each, across all classes
+    jobs.sort(key=lambda job: (job[2] // cells_per_tile, job[3] // cells_per_tile, job[2], job[3]))
+    return jobs
+
+def allocate_tile_buffers(ds, tile_pixels, count):
+    """Preallocate reusable (bands, tile, tile) read buffers matching a dataset's band type"""
+    dtype = gdal_array.GDALTypeCodeToNumericTypeCode(ds.GetRasterBand(1).DataType)
+    return [np.empty((ds.RasterCount, tile_pixels, tile_pixels), dtype=dtype) for _ in range(count)]
+
 def extract_patches_multisensor(sensor_paths, lc_filtered_path, lc_unfiltered_path,
-                               patch_locations, window_size, stride, output_dir, split_name):
-    """Extract patches from multiple sensors and organize into sensor-specific folders"""
-    from tqdm import tqdm
-    
-    # Create organized directory structure for each sensor
-    sensor_extracted_counts = {}
-    
+                               patch_locations, window_size, stride, output_dir, split_name,
+                               tile_size=2048, max_tiles_in_flight=1, label_lut=None,
+                               write_labels=True, write_threads=None):
+    """Extract patches from multiple sensors plus common labels from bulk super-tile reads"""
+    # With label_lut, lc_unfiltered_path is the original land cover and is remapped per tile;
+    # write_labels=False extracts only the sensor images (see extract_patches_parallel)
+    # Prepare each sensor once: output folder, band count, georeferencing and read handle
+    sensors = {}
     for sensor_name, sensor_path in sensor_paths.items():
         # Create directories for this sensor
         sensor_img_dir = os.path.join(output_dir, split_name, sensor_name, 'img')
@@ -486,185 +831,251 @@ def extract_patches_multisensor(sensor_paths, lc_filtered_path, lc_unfiltered_pa
         
         # Get number of bands for this sensor
         try:
-            sensor_ds = gdal.Open(sensor_path, gdal.GA_ReadOnly)
+            sensor_ds = open_raster(sensor_path)
             if sensor_ds is None:
                 print(f"Warning: Could not open sensor image for {sensor_name}")
                 continue
-            num_bands = sensor_ds.RasterCount
-            sensor_ds = None
+            sensors[sensor_name] = {
+                'ds': sensor_ds,
+                'img_dir': sensor_img_dir,
+                'bands': sensor_ds.RasterCount,
+                'gt': sensor_ds.GetGeoTransform(),
+                'projection': sensor_ds.GetProjection()
+            }
         except:
             print(f"Warning: Could not determine bands for {sensor_name}, skipping")
             continue
         
-        print(f"\n  Extracting {split_name} patches for {sensor_name} ({num_bands} bands)...")
-        
-        # Extract patches for this sensor
-        extracted = extract_patches_for_sensor(
-            sensor_path, lc_filtered_path, lc_unfiltered_path,
-            patch_locations, window_size, stride, 
-            sensor_img_dir, split_name, sensor_name, num_bands
-        )
-        
-        sensor_extracted_counts[sensor_name] = extracted
-        print(f"    Extracted {extracted} patches for {sensor_name}")
+        print(f"  {sensor_name}: {sensors[sensor_name]['bands']} bands")
+    
+    # Only create labels if at least one sensor can be processed (or no sensor was requested at all)
+    if not sensors and (sensor_paths or not write_labels):
+        return {}
     
-    # Create common label directory (same labels for all sensors)
-    if sensor_extracted_counts:  # Only create labels if at least one sensor was processed
-        print(f"\n  Creating common label patches for {split_name}...")
+    lc_filtered_ds = lc_unfiltered_ds = None
+    if write_labels:
+        # Common label directory (same labels for all sensors)
         label_dir = os.path.join(output_dir, split_name, 'labels')
-        os.makedirs(label_dir, exist_ok=True)
+        filtered_dir = os.path.join(label_dir, 'filtered')
+        unfiltered_dir = os.path.join(label_dir, 'unfiltered')
+        os.makedirs(filtered_dir, exist_ok=True)
+        os.makedirs(unfiltered_dir, exist_ok=True)
         
-        extract_label_patches(
-            lc_filtered_path, lc_unfiltered_path,
-            patch_locations, window_size, stride, 
-            label_dir, split_name
+        # Open land cover datasets
+        lc_filtered_ds = open_raster(lc_filtered_path)
+        lc_unfiltered_ds = open_raster(lc_unfiltered_path)
+        if lc_filtered_ds is None or lc_unfiltered_ds is None:
+            raise ValueError("Failed to open land cover datasets")
+        
+        # Read geotransform and projection from filtered dataset
+        lc_gt = lc_filtered_ds.GetGeoTransform()
+        lc_projection = lc_filtered_ds.GetProjection()
+    
+    # Keep at least a 1 GB block cache so neighbouring super-tiles reuse decompressed blocks
+    if gdal.GetCacheMax() < 2**30:
+        gdal.SetCacheMax(2**30)
+    
+    def patch_geotransform(gt, x_offset, y_offset):
+        return (
+            gt[0] + x_offset * gt[1],
+            gt[1], gt[2],
+            gt[3] + y_offset * gt[5],
+            gt[4], gt[5]
         )
     
-    return sensor_extracted_counts
-
-def extract_patches_for_sensor(sensor_path, lc_filtered_path, lc_unfiltered_path,
-                              patch_locations, window_size, stride, 
-                              output_dir, split_name, sensor_name, num_bands):
-    """Extract patches for a specific sensor"""
-    # Open land cover datasets
-    lc_filtered_ds = gdal.Open(lc_filtered_path, gdal.GA_ReadOnly)
-    lc_unfiltered_ds = gdal.Open(lc_unfiltered_path, gdal.GA_ReadOnly)
-    
-    if lc_filtered_ds is None or lc_unfiltered_ds is None:
-        raise ValueError("Failed to open land cover datasets")
-    
-    total_extracted = 0
+    def read_tile(ds, x_offset, y_offset, width, height, buffer):
+        """Read one (bands, height, width) super-tile into a preallocated buffer"""
+        tile = buffer[:, :height, :width]
+        if ds.ReadAsArray(x_offset, y_offset, width, height, buf_obj=tile) is None:
+            raise ValueError(f"Could not read tile at ({x_offset}, {y_offset})")
+        return tile
+    
+    def patch_view(tile, di, dj):
+        """Zero-copy (bands, window, window) patch at cell offset (di, dj) from the tile origin"""
+        y = di * stride
+        x = dj * stride
+        return tile[:, y:y + window_size, x:x + window_size]
+    
+    # Writer threads run concurrently, so each keeps its own reusable uint8 buffer per sensor
+    writer_state = threading.local()
+    
+    def uint8_buffer(sensor_name, shape):
+        buffers = getattr(writer_state, 'buffers', None)
+        if buffers is None:
+            buffers = writer_state.buffers = {}
+        buffer = buffers.get(sensor_name)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[sensor_name] = np.empty(shape, dtype=np.uint8)
+        return buffer
+    
+    def write_sensor_patch(sensor_name, class_id, patch_idx, image_patch, patch_gt):
+        try:
+            # Ensure UInt8 format
+            if image_patch.dtype != np.uint8:
+                # Clip to 0-255 and cast in a single pass into this thread's uint8 buffer
+                # (the source is a view of a shared tile buffer, so it is not clipped in place)
+                image_patch = np.clip(image_patch, 0, 255, casting='unsafe',
+                                      out=uint8_buffer(sensor_name, image_patch.shape))
+            
+            # Save image patch for this sensor
+            sensor = sensors[sensor_name]
+            save_geotiff_uint8(image_patch,
+                             os.path.join(sensor['img_dir'], f"class_{class_id}_patch_{patch_idx}.tif"),
+                             patch_gt, sensor['projection'])
+            return sensor_name
+            
+        except Exception as e:
+            print(f"Error extracting patch {patch_idx} for class {class_id}, sensor {sensor_name}: {str(e)}")
+            return None
     
-    for class_id, coords in tqdm(patch_locations.items(), desc=f"{sensor_name}"):
-        if not coords:
-            continue
-        
-        # Process each patch
-        for patch_idx, (i, j) in enumerate(coords):
-            try:
-                x_offset = int(j * stride)
-                y_offset = int(i * stride)
-                
-                # Open sensor image for this patch
-                sensor_ds = gdal.Open(sensor_path, gdal.GA_ReadOnly)
-                if sensor_ds is None:
-                    raise ValueError(f"Could not open sensor image: {sensor_path}")
-                
-                # Read geotransform and projection
-                gt = sensor_ds.GetGeoTransform()
-                projection = sensor_ds.GetProjection()
-                
-                # Read all bands for this sensor
-                bands_data = []
-                for band_num in range(1, num_bands + 1):
-                    band = sensor_ds.GetRasterBand(band_num)
-                    patch = band.ReadAsArray(x_offset, y_offset, window_size, window_size)
-                    if patch is None or patch.shape != (window_size, window_size):
-                        raise ValueError(f"Invalid band {band_num} for sensor {sensor_name}")
-                    bands_data.append(patch)
-                
-                sensor_ds = None
-                
-                # Stack bands and ensure UInt8 format
-                image_patch = np.stack(bands_data, axis=0)
-                if image_patch.dtype != np.uint8:
-                    # Convert to UInt8 if needed (clip to 0-255 range)
-                    image_patch = np.clip(image_patch, 0, 255).astype(np.uint8)
-                
-                # Create patch geotransform
-                patch_gt = (
-                    gt[0] + x_offset * gt[1],
-                    gt[1], gt[2],
-                    gt[3] + y_offset * gt[5],
-                    gt[4], gt[5]
-                )
-                
-                # Create patch filename
-                patch_filename = f"class_{class_id}_patch_{patch_idx}.tif"
-                
-                # Save image patch for this sensor
-                save_geotiff_uint8(image_patch, 
-                                 os.path.join(output_dir, patch_filename),
-                                 patch_gt, projection)
-                
-                total_extracted += 1
+    def write_label_patches(class_id, patch_idx, lc_filtered_patch, lc_unfiltered_patch, patch_gt):
+        try:
+            patch_filename = f"class_{class_id}_patch_{patch_idx}.tif"
+            
+            # Save filtered label patch
+            save_geotiff_int16(lc_filtered_patch.astype(np.int16, copy=False),
+                             os.path.join(filtered_dir, patch_filename),
+                             patch_gt, lc_projection)
+            
+            # Save unfiltered label patch
+            save_geotiff_int16(lc_unfiltered_patch.astype(np.int16, copy=False),
+                             os.path.join(unfiltered_dir, patch_filename),
+                             patch_gt, lc_projection)
+            
+        except Exception as e:
+            print(f"Error extracting label patch {patch_idx} for class {class_id}: {str(e)}")
+        return None
+    
+    print(f"\n  Extracting {split_name} patches for {list(sensors.keys())}"
+          f"{' and common labels' if write_labels else ''}...")
+    
+    # Bin the jobs by super-tile: every patch whose cell falls in the same tile_size block
+    cells_per_tile = max(1, tile_size // stride)
+    jobs = sorted_patch_jobs(patch_locations, cells_per_tile)
+    tile_pixels = (cells_per_tile - 1) * stride + window_size
+    
+    # GDAL reads straight into reused buffers; one more than the tiles still being written
+    ring_size = max_tiles_in_flight + 1
+    tile_buffers = {sensor_name: allocate_tile_buffers(sensor['ds'], tile_pixels, ring_size)
+                    for sensor_name, sensor in sensors.items()}
+    if write_labels:
+        lc_filtered_buffers = allocate_tile_buffers(lc_filtered_ds, tile_pixels, ring_size)
+        lc_unfiltered_buffers = allocate_tile_buffers(lc_unfiltered_ds, tile_pixels, ring_size)
+        if label_lut is not None:
+            label_lut = np.asarray(label_lut, dtype=np.int16)
+            lc_remapped_buffers = [np.empty((1, tile_pixels, tile_pixels), dtype=np.int16)
+                                   for _ in range(ring_size)]
+    tiles = [list(group) for _, group in
+             groupby(jobs, key=lambda job: (job[2] // cells_per_tile, job[3] // cells_per_tile))]
+    
+    sensor_extracted_counts = {sensor_name: 0 for sensor_name in sensors}
+    
+    def collect(futures):
+        for future in futures:
+            sensor_name = future.result()
+            if sensor_name is not None:
+                sensor_extracted_counts[sensor_name] += 1
+    
+    # Reads happen here (one per dataset and super-tile); the pool only compresses and writes
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=write_threads or os.cpu_count()) as executor:
+        for tile_number, tile_jobs in enumerate(tqdm(tiles, desc=f"{split_name} tiles")):
+            slot = tile_number % ring_size
+            
+            # Bounding box of this bin's patches only, not the whole super-tile
+            i_first = min(job[2] for job in tile_jobs)
+            j_first = min(job[3] for job in tile_jobs)
+            y_offset = i_first * stride
+            x_offset = j_first * stride
+            height = (max(job[2] for job in tile_jobs) - i_first) * stride + window_size
+            width = (max(job[3] for job in tile_jobs) - j_first) * stride + window_size
+            futures = []
+            
+            for sensor_name, sensor in sensors.items():
+                try:
+                    tile = read_tile(sensor['ds'], x_offset, y_offset, width, height,
+                                     tile_buffers[sensor_name][slot])
+                except Exception as e:
+                    print(f"Error reading {sensor_name} tile at cell ({i_first}, {j_first}): {str(e)}")
+                    continue
                 
-            except Exception as e:
-                print(f"Error extracting patch {patch_idx} for class {class_id}, sensor {sensor_name}: {str(e)}")
-                continue
+                for class_id, patch_idx, i, j in tile_jobs:
+                    futures.append(executor.submit(
+                        write_sensor_patch, sensor_name, class_id, patch_idx, patch_view(tile, i - i_first, j - j_first),
+                        patch_geotransform(sensor['gt'], j * stride, i * stride)))
+            
+            if write_labels:
+                try:
+                    filtered_tile = read_tile(lc_filtered_ds, x_offset, y_offset, width, height,
+                                              lc_filtered_buffers[slot])
+                    unfiltered_tile = read_tile(lc_unfiltered_ds, x_offset, y_offset, width, height,
+                                                lc_unfiltered_buffers[slot])
+                    if label_lut is not None:
+                        remapped_tile = lc_remapped_buffers[slot][:, :height, :width]
+                        remap_labels(unfiltered_tile[0], label_lut, remapped_tile[0])
+                        unfiltered_tile = remapped_tile
+                    for class_id, patch_idx, i, j in tile_jobs:
+                        futures.append(executor.submit(
+                            write_label_patches, class_id, patch_idx,
+                            patch_view(filtered_tile, i - i_first, j - j_first)[0],
+                            patch_view(unfiltered_tile, i - i_first, j - j_first)[0],
+                            patch_geotransform(lc_gt, j * stride, i * stride)))
+                except Exception as e:
+                    print(f"Error reading label tile at cell ({i_first}, {j_first}): {str(e)}")
+            
+            # Bound the queued tiles; their buffers are reused once the writes finish
+            in_flight.append(futures)
+            if len(in_flight) > max_tiles_in_flight:
+                collect(in_flight.popleft())
+        
+        while in_flight:
+            collect(in_flight.popleft())
     
+    for sensor in sensors.values():
+        sensor['ds'] = None
     lc_filtered_ds = lc_unfiltered_ds = None
-    return total_extracted
+    
+    for sensor_name, extracted in sensor_extracted_counts.items():
+        print(f"    Extracted {extracted} patches for {sensor_name}")
+    
+    return sensor_extracted_counts
 
-def extract_label_patches(lc_filtered_path, lc_unfiltered_path,
-                         patch_locations, window_size, stride, 
-                         output_dir, split_name):
-    """Extract label patches (common for all sensors)"""
-    from tqdm import tqdm
-    
-    # Open land cover datasets
-    lc_filtered_ds = gdal.Open(lc_filtered_path, gdal.GA_ReadOnly)
-    lc_unfiltered_ds = gdal.Open(lc_unfiltered_path, gdal.GA_ReadOnly)
-    
-    if lc_filtered_ds is None or lc_unfiltered_ds is None:
-        raise ValueError("Failed to open land cover datasets")
-    
-    # Read geotransform and projection from filtered dataset
-    gt = lc_filtered_ds.GetGeoTransform()
-    projection = lc_filtered_ds.GetProjection()
-    
-    filtered_dir = os.path.join(output_dir, 'filtered')
-    unfiltered_dir = os.path.join(output_dir, 'unfiltered')
-    os.makedirs(filtered_dir, exist_ok=True)
-    os.makedirs(unfiltered_dir, exist_ok=True)
-    
-    for class_id, coords in tqdm(patch_locations.items(), desc="Labels"):
-        if not coords:
-            continue
+def extract_patches_worker(cache_mb, gdal_config, *args, **kwargs):
+    """Process entry point: apply the GDAL settings in this process, then run extract_patches_multisensor"""
+    apply_gdal_settings(cache_mb, gdal_config)
+    return extract_patches_multisensor(*args, **kwargs)
+
+def extract_patches_parallel(sensor_paths, lc_filtered_path, lc_unfiltered_path,
+                             patch_locations, window_size, stride, output_dir, split_name,
+                             label_lut=None):
+    """Extract each sensor's patches in its own process (labels in one more) and return per-sensor counts"""
+    # Outputs go to separate directories and workers are spawned, not forked: a forked worker would
+    # inherit the parent's _DATASET_CACHE handles (shared file offsets, dead GDAL decode threads).
+    # Spawned workers open their own datasets; cache and writer threads are divided between them
+    num_workers = len(sensor_paths) + 1
+    cache_mb = max(1024, EXTRACTION_CACHE_MB // num_workers)
+    write_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    common_args = (lc_filtered_path, lc_unfiltered_path, patch_locations, window_size, stride,
+                   output_dir, split_name)
+    
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        sensor_futures = {
+            sensor_name: executor.submit(extract_patches_worker, cache_mb, EXTRACTION_GDAL_CONFIG,
+                                         {sensor_name: sensor_path}, *common_args,
+                                         write_labels=False, write_threads=write_threads)
+            for sensor_name, sensor_path in sensor_paths.items()
+        }
+        label_future = executor.submit(extract_patches_worker, cache_mb, EXTRACTION_GDAL_CONFIG,
+                                       {}, *common_args, label_lut=label_lut,
+                                       write_threads=write_threads)
         
-        # Process each patch
-        for patch_idx, (i, j) in enumerate(coords):
-            try:
-                x_offset = int(j * stride)
-                y_offset = int(i * stride)
-                
-                # Read land cover patches
-                lc_filtered_patch = lc_filtered_ds.GetRasterBand(1).ReadAsArray(
-                    x_offset, y_offset, window_size, window_size)
-                
-                lc_unfiltered_patch = lc_unfiltered_ds.GetRasterBand(1).ReadAsArray(
-                    x_offset, y_offset, window_size, window_size)
-                
-                if (lc_filtered_patch is None or lc_unfiltered_patch is None or
-                    lc_filtered_patch.shape != (window_size, window_size)):
-                    continue
-                
-                # Create patch geotransform
-                patch_gt = (
-                    gt[0] + x_offset * gt[1],
-                    gt[1], gt[2],
-                    gt[3] + y_offset * gt[5],
-                    gt[4], gt[5]
-                )
-                
-                # Create patch filename
-                patch_filename = f"class_{class_id}_patch_{patch_idx}.tif"
-                
-                # Save filtered label patch
-                save_geotiff_int16(lc_filtered_patch.astype(np.int16),
-                                 os.path.join(filtered_dir, patch_filename),
-                                 patch_gt, projection)
-                
-                # Save unfiltered label patch
-                save_geotiff_int16(lc_unfiltered_patch.astype(np.int16),
-                                 os.path.join(unfiltered_dir, patch_filename),
-                                 patch_gt, projection)
-                
-            except Exception as e:
-                print(f"Error extracting label patch {patch_idx} for class {class_id}: {str(e)}")
-                continue
+        sensor_counts = {}
+        for sensor_name, future in sensor_futures.items():
+            sensor_counts.update(future.result())
+        label_future.result()
     
-    lc_filtered_ds = lc_unfiltered_ds = None
+    return sensor_counts
 
 def save_geotiff_uint8(array, path, geotransform, projection):
     """Save UInt8 array as GeoTIFF"""
@@ -675,21 +1086,22 @@ def save_geotiff_uint8(array, path, geotransform, projection):
     else:
         bands, height, width = array.shape
     
-    options = ['COMPRESS=LZW', 'TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+    options = ['COMPRESS=LZW', 'TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256',
+               'SPARSE_OK=YES', 'NUM_THREADS=ALL_CPUS']
     if height * width > 1000000:
         options.append('BIGTIFF=YES')
+    if bands > 1:
+        # Pixel-interleaved blocks: every band of a block is encoded together in one chunk
+        options.append('INTERLEAVE=PIXEL')
     
     ds = driver.Create(path, width, height, bands, gdal.GDT_Byte, options=options)
     ds.SetGeoTransform(geotransform)
     ds.SetProjection(projection)
     
-    if array.ndim == 2:
-        ds.GetRasterBand(1).WriteArray(array)
-    else:
-        for b in range(bands):
-            ds.GetRasterBand(b+1).WriteArray(array[b])
+    # One dataset-level write for all bands instead of a per-band loop
+    ds.WriteArray(array)
     
-    ds.FlushCache()
+    # Closing the dataset flushes it; no explicit FlushCache per patch
     ds = None
 
 def save_geotiff_int16(array, path, geotransform, projection):
@@ -697,7 +1109,8 @@ def save_geotiff_int16(array, path, geotransform, projection):
     driver = gdal.GetDriverByName('GTiff')
     height, width = array.shape
     
-    options = ['COMPRESS=LZW', 'TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+    options = ['COMPRESS=LZW', 'TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256',
+               'SPARSE_OK=YES', 'NUM_THREADS=ALL_CPUS']
     if height * width > 1000000:
         options.append('BIGTIFF=YES')
     
@@ -709,7 +1122,7 @@ def save_geotiff_int16(array, path, geotransform, projection):
     band.WriteArray(array)
     band.SetNoDataValue(-99)
     
-    ds.FlushCache()
+    # Closing the dataset flushes it; no explicit FlushCache per patch
     ds = None
 
 def create_manifest_file(output_dir, split_name, sensor_counts, total_labels):
@@ -741,17 +1154,66 @@ def create_manifest_file(output_dir, split_name, sensor_counts, total_labels):
     
     print(f"  Manifest file created: {manifest_path}")
 
-def scan_original_classes(lc_path, batch_size=2048):
-    """Scan the original land cover to find all existing classes"""
+def input_signature(paths):
+    """Absolute path -> modification time of each existing input, used to validate cached results"""
+    return {os.path.abspath(path): os.path.getmtime(path) for path in paths if os.path.exists(path)}
+
+def load_cached_result(cache_path, name, signature):
+    """Return a cached result computed from inputs with this signature, or None"""
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r') as f:
+            entry = json.load(f).get(name)
+    except (OSError, ValueError):
+        return None
+    if entry is None or entry.get('inputs') != signature:
+        return None
+    return entry['result']
+
+def save_cached_result(cache_path, name, signature, result):
+    """Store a result and its input signature in the scan cache file"""
+    if cache_path is None:
+        return
+    cache = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+    cache[name] = {'inputs': signature, 'result': result}
+    write_json(cache_path, cache)
+
+def scan_original_classes(lc_path, batch_size=2048, cache_path=None):
+    """Scan the original land cover to find all existing classes (cached in cache_path by file mtime)"""
+    signature = input_signature([lc_path])
+    cached_classes = load_cached_result(cache_path, 'original_classes', signature)
+    if cached_classes is not None:
+        print(f"Using cached scan of unchanged land cover: {len(cached_classes)} classes {cached_classes}")
+        return cached_classes
+    
     print("Scanning original land cover for classes...")
-    src_ds = gdal.Open(lc_path)
+    src_ds = open_raster(lc_path)
     if src_ds is None:
         raise ValueError(f"Could not open land cover file: {lc_path}")
     
     rows = src_ds.RasterYSize
     cols = src_ds.RasterXSize
+    band = src_ds.GetRasterBand(1)  # Fetched once, reused by every batch read
+    
+    # Batches follow the internal block grid so each compressed tile is decoded once
+    batch_size = block_aligned_batch_size(band, batch_size)
+    
+    # Small integer rasters: count values with bincount into a presence vector (no sort per tile)
+    dtype = np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
+    use_bincount = dtype.kind in 'iu' and dtype.itemsize <= 2
+    if use_bincount:
+        offset = -np.iinfo(dtype).min  # Shift signed values (e.g. -99) to non-negative indices
+        present = np.zeros(2 ** (8 * dtype.itemsize), dtype=bool)
+    else:
+        classes = set()
     
-    classes = set()
     num_batches_y = math.ceil(rows / batch_size)
     num_batches_x = math.ceil(cols / batch_size)
     
@@ -762,43 +1224,65 @@ def scan_original_classes(lc_path, batch_size=2048):
             x_start = batch_x * batch_size
             x_end = min((batch_x + 1) * batch_size, cols)
             
-            batch_array = src_ds.GetRasterBand(1).ReadAsArray(x_start, y_start, 
-                                                             x_end - x_start, y_end - y_start)
-            if batch_array is not None:
-                batch_classes = np.unique(batch_array)
-                classes.update(batch_classes)
+            batch_array = band.ReadAsArray(x_start, y_start, x_end - x_start, y_end - y_start)
+            if batch_array is None:
+                continue
+            
+            if use_bincount:
+                values = batch_array.ravel()
+                if offset:
+                    values = values.astype(np.int32) + offset
+                present |= np.bincount(values, minlength=present.size).astype(bool)
+            else:
+                classes.update(np.unique(batch_array))
     
     src_ds = None
     
+    if use_bincount:
+        classes = np.nonzero(present)[0] - offset
+    
     # Convert to sorted list, remove 0 (background)
     classes = sorted([int(c) for c in classes if c != 0])
     print(f"Found {len(classes)} original classes (excluding 0): {classes}")
+    save_cached_result(cache_path, 'original_classes', signature, classes)
     return classes
 
+def write_json(path, data):
+    """Write data as indented JSON in a single write (orjson when installed, json otherwise)"""
+    if ORJSON_AVAILABLE:
+        # Integer keys become strings and NumPy scalars/arrays are serialized, as json would need
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS |
+                               orjson.OPT_SERIALIZE_NUMPY)
+        with open(path, 'wb') as f:
+            f.write(payload)
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
 def save_label_mapping_metadata(output_dir, label_mapping_metadata):
     """Save label mapping metadata to JSON file"""
     metadata_path = os.path.join(output_dir, 'label_mapping_metadata.json')
     
-    # Convert numpy types to Python types for JSON serialization
-    serializable_metadata = {
-        'original_to_new': {int(k): int(v) for k, v in label_mapping_metadata['original_to_new'].items()},
-        'new_to_original': {int(k): int(v) for k, v in label_mapping_metadata['new_to_original'].items()},
-        'new_class_definitions': label_mapping_metadata['new_class_definitions'],
-        'original_alberta_classes': [int(c) for c in label_mapping_metadata['original_alberta_classes']]
-    }
-    
-    with open(metadata_path, 'w') as f:
-        json.dump(serializable_metadata, f, indent=2)
+    # Class ids are plain Python ints already (scan_original_classes), so no conversion pass
+    write_json(metadata_path, label_mapping_metadata)
     
     print(f"Label mapping metadata saved to: {metadata_path}")
     return metadata_path
 
-def verify_sensor_dimensions(sensor_paths, reference_path):
-    """Verify that all sensor images have the same dimensions and geotransform"""
+def verify_sensor_dimensions(sensor_paths, reference_path, cache_path=None):
+    """Verify that all sensor images have the same dimensions and geotransform (cached by file mtimes)"""
+    # Same sensor set and unchanged files: reuse the previous verification
+    signature = input_signature([reference_path] + list(sensor_paths.values()))
+    signature['sensors'] = sorted(sensor_paths)
+    cached_info = load_cached_result(cache_path, 'sensor_info', signature)
+    if cached_info is not None:
+        print(f"Using cached verification of unchanged inputs: {list(cached_info.keys())}")
+        return cached_info
+    
     print("Verifying sensor dimensions...")
     
     # Open reference (land cover) to get dimensions
-    ref_ds = gdal.Open(reference_path, gdal.GA_ReadOnly)
+    ref_ds = open_raster(reference_path)
     ref_rows = ref_ds.RasterYSize
     ref_cols = ref_ds.RasterXSize
     ref_gt = ref_ds.GetGeoTransform()
@@ -810,7 +1294,7 @@ def verify_sensor_dimensions(sensor_paths, reference_path):
     sensor_info = {}
     for sensor_name, sensor_path in sensor_paths.items():
         try:
-            ds = gdal.Open(sensor_path, gdal.GA_ReadOnly)
+            ds = open_raster(sensor_path)
             if ds is None:
                 print(f"  ERROR: Could not open {sensor_name} at {sensor_path}")
                 continue
@@ -827,8 +1311,7 @@ def verify_sensor_dimensions(sensor_paths, reference_path):
                 continue
             
             # Check geotransform (allow small floating point differences)
-            gt_match = all(abs(gt[i] - ref_gt[i]) < 0.001 for i in range(6))
-            if not gt_match:
+            if not np.allclose(np.asarray(gt), np.asarray(ref_gt), atol=1e-3):
                 print(f"  WARNING: {sensor_name} geotransform differs slightly")
             
             sensor_info[sensor_name] = {
@@ -848,6 +1331,9 @@ def verify_sensor_dimensions(sensor_paths, reference_path):
     
     if len(sensor_info) != len(sensor_paths):
         print(f"\nWARNING: Only {len(sensor_info)} out of {len(sensor_paths)} sensors passed verification")
+    else:
+        # Only a fully successful verification is reused
+        save_cached_result(cache_path, 'sensor_info', signature, sensor_info)
     
     return sensor_info
 
@@ -859,7 +1345,7 @@ def main():
     # Define all sensor paths
     sensor_paths = {
         'landsat8': r'D:\Hackathon15_AlphaEarth\Alberta_L8_2020\Alberta_2020_NAD83_StatsCan_L8_30m_Mosaics_EPSG_3979_Clipped_Stack\Alberta_2020_L8_Stacked_6Bands.tif',  # Landsat-8: 6 bands
-        'sentinel2': r'D:\Hackathon15_AlphaEarth\Alberta_Sentinel2_2020\Alberta_2020_NAD83_StatsCan_Sentinel2_30m_Mosaics_EPSG_3979_Clipped_Stack\Alberta_2020_S2_Stacked_10Bands.tif',      # Sentinel-2: 10 bands
+        'sentinel2': r'D:\Hackathon15_AlphaEarth\Alberta_Sentinel2_2020\Alberta_2020_NAD83_StatsCan_Sentinel2_30m_Mosaics_EPSG_3979_Clipped_Stack\Alberta_2020_S2_Stacked_10Bands.vrt',      # Sentinel-2: 10 bands
         'alphaearth': r'D:\Hackathon15_AlphaEarth\AlphaEarth_Dataset\Alberta_2020_NAD83_StatsCan_AlphaEarth_30m_Mosaics_EPSG_3979_Clipped_Stack\Alberta_2020_AlphaEarth_Stacked_64Bands.tif'  # AlphaEarth: 64 bands
     }
     
@@ -873,6 +1359,7 @@ def main():
     val_ratio = 0.15
     min_homogeneity = 0.8
     batch_size = 2048
+    random_seed = 42  # Fixed seed so the train/val/test split is reproducible
     
     os.makedirs(output_dir, exist_ok=True)
     
@@ -882,7 +1369,8 @@ def main():
     
     # Step 0: Verify all sensors have same dimensions as landcover
     print("\n0. Verifying sensor dimensions and alignment...")
-    sensor_info = verify_sensor_dimensions(sensor_paths, landcover_path)
+    scan_cache_path = os.path.join(output_dir, SCAN_CACHE_FILE)
+    sensor_info = verify_sensor_dimensions(sensor_paths, landcover_path, scan_cache_path)
     
     if not sensor_info:
         print("ERROR: No sensors passed verification. Exiting.")
@@ -892,12 +1380,15 @@ def main():
     
     # Step 1: Scan original classes and create label mapping
     print("\n1. Scanning original land cover and creating label mapping...")
-    original_classes = scan_original_classes(landcover_path, batch_size)
+    original_classes = scan_original_classes(landcover_path, batch_size, scan_cache_path)
     
     # Create label mapping
     original_to_new, new_to_original, new_class_definitions, sorted_original_classes = \
         create_alberta_label_mapping(original_classes)
     
+    # Lookup table original class -> new label (-99 for background/unmapped), built once
+    label_lut = build_label_lut(original_to_new)
+    
     # Save label mapping metadata
     label_mapping_metadata = {
         'original_to_new': original_to_new,
@@ -913,29 +1404,22 @@ def main():
     print(f"  New labels: {list(new_to_original.keys())}")
     print(f"  Background (original 0) mapped to: -99")
     
-    # Step 2: Remap original ground truth
-    print("\n2. Remapping original ground truth labels...")
-    lc_remapped_path = os.path.join(output_dir, 'LC_remapped.tif')
-    if not os.path.exists(lc_remapped_path):
-        remap_ground_truth(landcover_path, lc_remapped_path, original_to_new)
-    else:
-        print("  Remapped ground truth already exists")
-    
-    # Step 3: Create filtered version of remapped land cover
+    # Steps 2-4: Remap, filter and count abundance in one pass over the land cover tiles
+    # (the remapped labels are not stored; patch extraction applies the LUT per tile)
     lc_filtered_path = os.path.join(output_dir, 'LC_filtered.tif')
+    abundance_dir = os.path.join(output_dir, 'abundance_maps')
     if not os.path.exists(lc_filtered_path):
-        print("\n3. Creating filtered land cover from remapped data...")
-        apply_strict_majority_filter_batched(lc_remapped_path, lc_filtered_path,
-                                           min_homogeneity, batch_size)
+        print("\n2-4. Remapping, filtering and creating abundance maps in one pass...")
+        classes, stride, lc_rows, lc_cols, abundance_maps = process_landcover_streaming(
+            landcover_path, label_lut, sorted(new_to_original.keys()), lc_filtered_path, abundance_dir,
+            window_size, overlap, min_homogeneity, batch_size
+        )
     else:
-        print("\n3. Filtered land cover already exists")
-    
-    # Step 4: Create abundance maps based on filtered data
-    print("\n4. Creating abundance maps...")
-    abundance_dir = os.path.join(output_dir, 'abundance_maps')
-    classes, stride, lc_rows, lc_cols = create_abundance_maps_batched(
-        lc_filtered_path, abundance_dir, window_size, overlap, batch_size
-    )
+        print("\n2-4. Filtered land cover already exists, loading abundance maps...")
+        classes, stride, lc_rows, lc_cols, abundance_maps = create_abundance_maps_batched(
+            lc_filtered_path, abundance_dir, window_size, overlap, batch_size,
+            known_classes=sorted(new_to_original.keys())
+        )
     
     # Note: 'classes' now contains the new 0-based labels
     print(f"\n  Using {len(classes)} remapped classes: {classes}")
@@ -943,9 +1427,9 @@ def main():
     # Step 5: Select and split patches (identical for all sensors)
     print("\n5. Selecting and splitting patches (identical for all sensors)...")
     all_splits = select_and_split_patches_stratified(
-        abundance_dir, classes, lc_rows, lc_cols,
+        abundance_maps, classes, lc_rows, lc_cols,
         window_size, stride, min_patches_per_class,
-        train_ratio, val_ratio
+        train_ratio, val_ratio, seed=random_seed
     )
     
     # Calculate total patches for each split
@@ -974,11 +1458,11 @@ def main():
     for split_name in ['train', 'val', 'test']:
         print(f"\n  Extracting {split_name} patches...")
         
-        # Extract patches for all sensors
-        sensor_counts = extract_patches_multisensor(
-            sensor_paths_for_extraction, lc_filtered_path, lc_remapped_path,
+        # Extract patches for all sensors, one process per sensor plus one for the labels
+        sensor_counts = extract_patches_parallel(
+            sensor_paths_for_extraction, lc_filtered_path, landcover_path,
             all_splits[split_name], window_size, stride, 
-            patches_dir, split_name
+            patches_dir, split_name, label_lut=label_lut
         )
         
         # Calculate total labels for this split
@@ -1030,7 +1514,6 @@ def main():
     # Display directory structure
     print(f"\nOUTPUT DIRECTORY STRUCTURE:")
     print(f"  {output_dir}/")
-    print(f"  ├── LC_remapped.tif")
     print(f"  ├── LC_filtered.tif")
     print(f"  ├── abundance_maps/")
     print(f"  ├── patches/")
@@ -1074,10 +1557,15 @@ def main():
             'val_img_path': os.path.join(patches_dir, 'val', sensor_name, 'img'),
             'test_img_path': os.path.join(patches_dir, 'test', sensor_name, 'img')
         }
+        if sensor_name == 'alphaearth':
+            # Per-band dequantization of the 8-bit embedding patches
+            dataset_config['sensors'][sensor_name]['quantization'] = {
+                'scale': [ALPHAEARTH_QUANTIZATION['scale']] * info['bands'],
+                'zero_point': [ALPHAEARTH_QUANTIZATION['zero_point']] * info['bands']
+            }
     
     config_path = os.path.join(output_dir, 'multisensor_dataset_config.json')
-    with open(config_path, 'w') as f:
-        json.dump(dataset_config, f, indent=2)
+    write_json(config_path, dataset_config)
     
     print(f"\nDataset configuration saved to: {config_path}")
     
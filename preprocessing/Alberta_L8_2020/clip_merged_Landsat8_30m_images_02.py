@@ -1,9 +1,13 @@
 import os
-import glob
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from osgeo import gdal, ogr
 
 gdal.UseExceptions()
 
+# Decode compressed source blocks on all cores
+gdal.SetConfigOption('GDAL_NUM_THREADS', 'ALL_CPUS')
+
 # =====================================================
 # PATHS
 # =====================================================
@@ -29,11 +33,104 @@ landsat_bands = [
     "SR_B7",  # SWIR2
 ]
 
+# GeoTIFF creation options shared by every clipped output: fast multi-threaded ZSTD, and
+# blocks outside the Alberta boundary (all nodata 0) are left unwritten by SPARSE_OK
+CLIP_CREATION_OPTIONS = [
+    "COMPRESS=ZSTD",
+    "ZSTD_LEVEL=1",
+    "PREDICTOR=2",
+    "TILED=YES",
+    "BLOCKXSIZE=256",
+    "BLOCKYSIZE=256",
+    "BIGTIFF=IF_SAFER",
+    "NUM_THREADS=ALL_CPUS",
+    "INTERLEAVE=PIXEL",
+    "SPARSE_OK=TRUE"
+]
+
+# Landsat-8 SR band mosaics, e.g. Alberta_2020_L8_SR_B2_NAD83_StatsCan.tif, or the .vrt
+# mosaics step 01 writes when it does not materialize GeoTIFFs
+MOSAIC_NAME_PATTERN = re.compile(r"Alberta_2020_L8_SR_B\d+_NAD83_StatsCan\.(tif|vrt)")
+
+def mosaic_input_path(stem):
+    """Step-01 mosaic for a path without extension: the newer of the .tif and .vrt if both exist"""
+    candidates = [stem + ext for ext in (".tif", ".vrt") if os.path.exists(stem + ext)]
+    return max(candidates, key=os.path.getmtime) if candidates else stem + ".tif"
+
+# In-memory copy of the Alberta boundary used as the warp cutline
+CUTLINE_VSIMEM = "/vsimem/alberta_cutline.shp"
+
+def materialize_cutline():
+    """Copy the Alberta boundary into /vsimem once per process and return its path"""
+    # /vsimem is private to each process, so every worker builds its own copy on first use
+    if gdal.VSIStatL(CUTLINE_VSIMEM) is not None:
+        return CUTLINE_VSIMEM
+    
+    src_ds = ogr.Open(alberta_gpkg)
+    cutline_ds = ogr.GetDriverByName("ESRI Shapefile").CreateDataSource(CUTLINE_VSIMEM)
+    cutline_ds.CopyLayer(src_ds.GetLayer(0), "alberta_cutline")
+    cutline_ds = None
+    src_ds = None
+    return CUTLINE_VSIMEM
+
 # =====================================================
 # CLIP EACH LANDSAT-8 BAND SEPARATELY
 # =====================================================
-def clip_individual_bands():
-    """Clip each Landsat-8 band separately"""
+def clip_one_band(band):
+    """Clip a single Landsat-8 band (runs in its own process with its own datasets)"""
+    # Landsat-8 files use pattern: Alberta_2020_L8_SR_B2_NAD83_StatsCan.tif (or .vrt)
+    input_file = mosaic_input_path(os.path.join(mosaic_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan"))
+    output_file = os.path.join(output_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif")
+    
+    if not os.path.exists(input_file):
+        return band, input_file, None, "Input file not found", None
+    
+    try:
+        # Clip the band
+        warp_options = gdal.WarpOptions(
+            format="GTiff",
+            cutlineDSName=materialize_cutline(),
+            cropToCutline=True,
+            dstNodata=0,
+            resampleAlg='near',
+            multithread=True,
+            warpOptions=["NUM_THREADS=ALL_CPUS"],  # Parallel warp/decode, not just compression
+            creationOptions=CLIP_CREATION_OPTIONS,
+            # Preserve original resolution and CRS
+            xRes=30,  # 30m resolution
+            yRes=30,  # 30m resolution
+            targetAlignedPixels=False # Allows pixel boundaries to shift to match the shapefile exactly
+        )
+        
+        ds = gdal.Warp(output_file, input_file, options=warp_options)
+        ds = None
+        
+        # Verify the output
+        if not os.path.exists(output_file):
+            return band, input_file, None, "Output file creation failed", None
+        
+        # Get file info
+        ds = gdal.Open(output_file)
+        gt = ds.GetGeoTransform()
+        raster_band = ds.GetRasterBand(1)
+        info = {
+            'width': ds.RasterXSize,
+            'height': ds.RasterYSize,
+            'data_type': gdal.GetDataTypeName(raster_band.DataType),
+            'no_data': raster_band.GetNoDataValue(),
+            'resolution': gt[1],
+            'crs_preserved': '3979' in ds.GetProjection(),
+            'file_size_mb': os.path.getsize(output_file) / (1024 * 1024)
+        }
+        ds = None
+        
+        return band, input_file, output_file, None, info
+        
+    except Exception as e:
+        return band, input_file, None, str(e), None
+
+def clip_individual_bands(max_workers=None):
+    """Clip each Landsat-8 band separately, one process per band"""
     print("=" * 70)
     print("CLIPPING INDIVIDUAL LANDSAT-8 BANDS")
     print("=" * 70)
@@ -47,81 +144,39 @@ def clip_individual_bands():
     clipped_bands = []
     failed_bands = []
     
-    for band in landsat_bands:
-        # Landsat-8 files use pattern: Alberta_2020_L8_SR_B2_NAD83_StatsCan.tif
-        input_file = os.path.join(mosaic_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan.tif")
-        output_file = os.path.join(output_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif")
-        
-        print(f"\nProcessing Landsat-8 band {band}...")
-        print(f"  Input: {os.path.basename(input_file)}")
-        
-        if not os.path.exists(input_file):
-            print(f"  ✗ ERROR: Input file not found!")
-            failed_bands.append((band, "Input file not found"))
-            continue
+    # Each Warp already uses several threads, so use at most half the cores as processes
+    if max_workers is None:
+        max_workers = max(1, min(len(landsat_bands), (os.cpu_count() or 2) // 2))
+    print(f"Clipping {len(landsat_bands)} bands with {max_workers} parallel processes...")
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(clip_one_band, band) for band in landsat_bands]
         
-        try:
-            # Clip the band
-            warp_options = gdal.WarpOptions(
-                format="GTiff",
-                cutlineDSName=alberta_gpkg,
-                cropToCutline=True,
-                dstNodata=0,
-                resampleAlg='near',
-                creationOptions=[
-                    "COMPRESS=LZW",
-                    "PREDICTOR=2",
-                    "TILED=YES",
-                    "BLOCKXSIZE=256",
-                    "BLOCKYSIZE=256",
-                    "BIGTIFF=YES",
-                    "NUM_THREADS=ALL_CPUS"
-                ],
-                # Preserve original resolution and CRS
-                xRes=30,  # 30m resolution
-                yRes=30,  # 30m resolution
-                targetAlignedPixels=False # Allows pixel boundaries to shift to match the shapefile exactly
-            )
+        for future in as_completed(futures):
+            band, input_file, output_file, error, info = future.result()
             
-            print(f"  Clipping to Alberta boundary...")
-            ds = gdal.Warp(output_file, input_file, options=warp_options)
-            ds = None
+            print(f"\nProcessed Landsat-8 band {band}...")
+            print(f"  Input: {os.path.basename(input_file)}")
             
-            # Verify the output
-            if os.path.exists(output_file):
-                # Get file info
-                ds = gdal.Open(output_file)
-                width = ds.RasterXSize
-                height = ds.RasterYSize
-                gt = ds.GetGeoTransform()
-                proj = ds.GetProjection()
-                
-                # Get band information
-                raster_band = ds.GetRasterBand(1)
-                data_type = gdal.GetDataTypeName(raster_band.DataType)
-                no_data = raster_band.GetNoDataValue()
-                
-                ds = None
-                
-                file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
-                
-                print(f"  ✓ SUCCESS: Clipped Landsat-8 band {band}")
-                print(f"    Output: {os.path.basename(output_file)}")
-                print(f"    Size: {width} x {height} pixels")
-                print(f"    Data type: {data_type}")
-                print(f"    NoData value: {no_data}")
-                print(f"    Resolution: {gt[1]:.2f} m")
-                print(f"    File size: {file_size_mb:.1f} MB")
-                print(f"    CRS preserved: {'3979' in proj}")
-                
-                clipped_bands.append((band, output_file))
-            else:
-                print(f"  ✗ ERROR: Output file was not created")
-                failed_bands.append((band, "Output file creation failed"))
-                
-        except Exception as e:
-            print(f"  ✗ ERROR: {str(e)}")
-            failed_bands.append((band, str(e)))
+            if error is not None:
+                print(f"  ✗ ERROR: {error}")
+                failed_bands.append((band, error))
+                continue
+            
+            print(f"  ✓ SUCCESS: Clipped Landsat-8 band {band}")
+            print(f"    Output: {os.path.basename(output_file)}")
+            print(f"    Size: {info['width']} x {info['height']} pixels")
+            print(f"    Data type: {info['data_type']}")
+            print(f"    NoData value: {info['no_data']}")
+            print(f"    Resolution: {info['resolution']:.2f} m")
+            print(f"    File size: {info['file_size_mb']:.1f} MB")
+            print(f"    CRS preserved: {info['crs_preserved']}")
+            
+            clipped_bands.append((band, output_file))
+    
+    # Keep the band order of landsat_bands in the results
+    clipped_bands.sort(key=lambda item: landsat_bands.index(item[0]))
+    failed_bands.sort(key=lambda item: landsat_bands.index(item[0]))
     
     # Summary
     print("\n" + "=" * 70)
@@ -153,36 +208,40 @@ def batch_clip_all_files():
     print("BATCH CLIPPING ALL LANDSAT-8 FILES")
     print("=" * 70)
     
-    # Find all Landsat-8 mosaic files
-    pattern = os.path.join(mosaic_dir, "Alberta_2020_L8_*.tif")
-    mosaic_files = glob.glob(pattern)
+    # Find the Landsat-8 SR band mosaics in one directory scan; a band with both a .tif and
+    # a .vrt would write the same _CLIPPED.tif twice, so only its newer mosaic is kept
+    with os.scandir(mosaic_dir) as entries:
+        stems = {os.path.splitext(entry.path)[0] for entry in entries
+                 if entry.is_file() and MOSAIC_NAME_PATTERN.fullmatch(entry.name)}
+    valid_files = sorted(mosaic_input_path(stem) for stem in stems)
     
-    if not mosaic_files:
+    if not valid_files:
         print("No Landsat-8 mosaic files found!")
-        print(f"Checked pattern: {pattern}")
+        print(f"Checked pattern: {os.path.join(mosaic_dir, MOSAIC_NAME_PATTERN.pattern)}")
         return []
     
-    # Filter only Landsat-8 SR band files
-    valid_files = []
-    for filepath in mosaic_files:
-        filename = os.path.basename(filepath)
-        # Check if it matches our Landsat-8 pattern
-        if "Alberta_2020_L8_SR_B" in filename and "NAD83_StatsCan.tif" in filename:
-            valid_files.append(filepath)
-    
     print(f"Found {len(valid_files)} Landsat-8 mosaic files to clip")
     
     clipped_files = []
     failed_files = []
     
+    # Identical for every file, so build the options (and the in-memory cutline) once
+    warp_options = gdal.WarpOptions(
+        format="GTiff",
+        cutlineDSName=materialize_cutline(),
+        cropToCutline=True,
+        dstNodata=0,
+        creationOptions=CLIP_CREATION_OPTIONS,
+        xRes=30,
+        yRes=30,
+        targetAlignedPixels=True
+    )
+    
     for i, input_file in enumerate(valid_files, 1):
         filename = os.path.basename(input_file)
         
-        # Create output filename (append _CLIPPED before .tif)
-        if filename.endswith(".tif"):
-            output_filename = filename.replace(".tif", "_CLIPPED.tif")
-        else:
-            output_filename = f"{filename}_CLIPPED.tif"
+        # Create output filename (append _CLIPPED, always a GeoTIFF even for .vrt mosaics)
+        output_filename = f"{os.path.splitext(filename)[0]}_CLIPPED.tif"
         
         output_file = os.path.join(output_dir, output_filename)
         
@@ -190,25 +249,6 @@ def batch_clip_all_files():
         
         try:
             # Clip the file
-            warp_options = gdal.WarpOptions(
-                format="GTiff",
-                cutlineDSName=alberta_gpkg,
-                cropToCutline=True,
-                dstNodata=0,
-                creationOptions=[
-                    "COMPRESS=LZW",
-                    "PREDICTOR=2",
-                    "TILED=YES",
-                    "BLOCKXSIZE=256",
-                    "BLOCKYSIZE=256",
-                    "BIGTIFF=YES",
-                    "NUM_THREADS=ALL_CPUS"
-                ],
-                xRes=30,
-                yRes=30,
-                targetAlignedPixels=True
-            )
-            
             ds = gdal.Warp(output_file, input_file, options=warp_options)
             ds = None
             
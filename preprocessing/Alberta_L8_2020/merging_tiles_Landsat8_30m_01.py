@@ -1,8 +1,19 @@
 import os
-import glob
+import sys
+import fnmatch
 import re
+import logging
+import logging.handlers
+import multiprocessing
 from osgeo import gdal, osr
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Mosaic progress goes through this logger: __main__ sends it to the console and a buffered
+# log file, and band worker processes forward their records to it through a queue.
+# MOSAIC_LOG_LEVEL sets the level (WARNING drops the per-band and per-tile detail).
+log = logging.getLogger("l8_mosaic")
+log.addHandler(logging.NullHandler())
 
 # ============================================
 # CONFIGURATION - FOR YOUR EXACT STRUCTURE
@@ -16,6 +27,9 @@ TARGET_CRS = 'EPSG:3979'
 SOURCE_CRS = 'EPSG:3979'  # Same as target - no reprojection needed!
 TARGET_RESOLUTION = 30  # 30 meters
 
+# Authority clause of TARGET_CRS as it appears in GetProjection() WKT
+EXPECTED_CRS_WKT_AUTHORITY = 'AUTHORITY["EPSG","3979"]'
+
 # Landsat-8 bands you downloaded (based on your description)
 LANDSAT_BANDS = [
     'SR_B2',  # Blue
@@ -26,85 +40,168 @@ LANDSAT_BANDS = [
     'SR_B7',  # SWIR2
 ]
 
-def get_all_bands():
-    """Get list of all Landsat-8 bands from the downloaded folders"""
-    bands = []
-    
-    # Check each band folder exists in your structure
-    for band_name in LANDSAT_BANDS:
-        band_folder = band_name  # e.g., "SR_B2", "SR_B3", etc.
-        band_path = os.path.join(base_dir, band_folder)
-        
-        if os.path.exists(band_path):
-            bands.append((band_folder, band_name))
-            print(f"  ✓ Found folder: {band_folder}")
-        else:
-            print(f"  ✗ Missing folder: {band_folder}")
-    
-    print(f"\nTotal band folders found: {len(bands)}")
-    return bands
+# Cloud-Optimized GeoTIFF options for the output: ZSTD level 1 encodes and decodes much faster than
+# LZW at a similar ratio, and the COG driver builds AVERAGE overviews in the same pass.
+# OVERVIEWS=AUTO reuses the tiles' own overviews (exposed through the VRT) when the export has them.
+# Bands are mosaicked in parallel processes, so each writer only gets 2 compression threads.
+MOSAIC_CREATION_OPTIONS = [
+    'COMPRESS=ZSTD',
+    'LEVEL=1',
+    'PREDICTOR=YES',
+    'BLOCKSIZE=512',
+    'BIGTIFF=IF_SAFER',
+    'NUM_THREADS=2',
+    'OVERVIEWS=AUTO',
+    'OVERVIEW_RESAMPLING=AVERAGE'
+]
 
-def get_crs_info():
-    """Get detailed information about the CRS"""
-    print(f"\nCOORDINATE SYSTEM INFORMATION:")
-    print(f"  Source CRS: {SOURCE_CRS}")
-    print(f"  Target CRS: {TARGET_CRS}")
-    print(f"  Resolution: {TARGET_RESOLUTION} meters")
-    print(f"  Note: No reprojection needed - tiles are already in target CRS")
-    print("-" * 60)
-
-def create_mosaic_no_reprojection(band_folder, band_name):
-    """Create mosaic WITHOUT reprojection for your exact file pattern"""
+# Source tile decoding threads per band process
+gdal.SetConfigOption('GDAL_NUM_THREADS', '2')
+
+# GDAL block cache shared out between the band processes, so the VRT translate keeps source tile
+# blocks resident instead of re-reading them (0.5-2 GB total works best; much larger caches slow GDAL down)
+MOSAIC_CACHE_MB = 2048
+# No VSI_CACHE here: its size applies to every open file, and the mosaic VRT keeps up to 100 tile
+# handles open in each band process, so even a small per-file cache adds up to many GB
+
+# Warp working buffer per band process (MB)
+WARP_MEMORY_MB = 1024
+
+# Diagnostic value-range report for each GeoTIFF mosaic; it costs a full read of the raster,
+# so it is off by default
+VERBOSE_STATS = False
+
+# Log file written next to the mosaics, flushed every LOG_BUFFER_RECORDS records (or on an error)
+LOG_FILE = 'landsat8_mosaics.log'
+LOG_BUFFER_RECORDS = 500
+
+# Band mosaics are independent, so each one runs in its own process
+MAX_BAND_WORKERS = min(len(LANDSAT_BANDS), os.cpu_count() or 1)
+
+# False keeps each band mosaic as a VRT over the source tiles: clipping (step 02) reads it
+# directly, so the full per-band GeoTIFF decode/recompress/write pass is skipped.
+# True writes the GeoTIFF mosaics as before.
+MATERIALIZE = False
+
+def mosaic_path_for(band_name):
+    """Path of the band mosaic written by create_mosaic_no_reprojection (.vrt or .tif)"""
+    extension = 'tif' if MATERIALIZE else 'vrt'
+    return os.path.join(output_dir, f'Alberta_2020_L8_{band_name}_NAD83_StatsCan.{extension}')
+
+# Tile row and column in names like Alberta_2020_L8_SR_SR_B2_tile_0_R0C1.tif
+_TILE_RE = re.compile(r'_R(\d+)C(\d+)\.tif$')
+
+# File names per band folder, scanned once per process
+_dir_cache = {}
+
+def list_band_dir(band_dir):
+    """Memoized file names of a band folder (os.scandir type flags, no stat per entry)"""
+    if band_dir not in _dir_cache:
+        with os.scandir(band_dir) as entries:
+            _dir_cache[band_dir] = [entry.name for entry in entries if entry.is_file()]
+    return _dir_cache[band_dir]
+
+def band_tile_files(band_dir, band_name):
+    """Paths of Alberta_2020_L8_SR_<band>_tile_*.tif in band_dir (plain prefix/suffix test)"""
+    prefix = f'Alberta_2020_L8_SR_{band_name}_tile_'
+    return [os.path.join(band_dir, name) for name in list_band_dir(band_dir)
+            if name.startswith(prefix) and name.endswith('.tif')]
+
+def match_band_files(band_dir, name_pattern):
+    """Paths in band_dir whose names match a glob-style pattern (used for the fallback patterns)"""
+    return [os.path.join(band_dir, name) for name in fnmatch.filter(list_band_dir(band_dir), name_pattern)]
+
+def tile_sort_key(tile_path):
+    """(row, col) of a tile filename, so tiles are listed row-major (999s when it does not follow the pattern)"""
+    match = _TILE_RE.search(os.path.basename(tile_path))
+    return (int(match.group(1)), int(match.group(2))) if match else (999, 999)
+
+def find_band_tiles(band_folder, band_name):
+    """Find and sort the tiles of one band (scanned once and shared by the CRS check and mosaic)"""
     band_dir = os.path.join(base_dir, band_folder)
     
     # Find all tiles for this band - YOUR EXACT NAMING PATTERN
     # Pattern: Alberta_2020_L8_SR_SR_B2_tile_0_R0C1.tif
     # Note the "SR_" duplication: "L8_SR_SR_B2"
-    pattern = os.path.join(band_dir, f'Alberta_2020_L8_SR_{band_name}_tile_*.tif')
-    tile_paths = glob.glob(pattern)
+    pattern = f'Alberta_2020_L8_SR_{band_name}_tile_*.tif'
+    tile_paths = band_tile_files(band_dir, band_name)
     
     if not tile_paths:
-        print(f"    ERROR: No tiles found for pattern: {pattern}")
+        log.error("    ERROR: No tiles found for pattern: %s", os.path.join(band_dir, pattern))
         
         # Try alternative patterns just in case
         alt_patterns = [
-            os.path.join(band_dir, f'*{band_name}*.tif'),
-            os.path.join(band_dir, f'*L8*{band_name}*.tif'),
-            os.path.join(band_dir, '*.tif'),  # All TIFFs in folder
+            f'*{band_name}*.tif',
+            f'*L8*{band_name}*.tif',
+            '*.tif',  # All TIFFs in folder
         ]
         
         for alt_pattern in alt_patterns:
-            alt_files = glob.glob(alt_pattern)
+            alt_files = match_band_files(band_dir, alt_pattern)
             if alt_files:
-                print(f"    Found {len(alt_files)} files with pattern: {alt_pattern}")
+                log.info("    Found %s files with pattern: %s", len(alt_files), os.path.join(band_dir, alt_pattern))
                 tile_paths = alt_files
                 break
         
         if not tile_paths:
-            print(f"    Checked directory: {band_dir}")
-            print(f"    Files in directory: {os.listdir(band_dir)[:5]}...")  # First 5 files
-            return None
+            log.info("    Checked directory: %s", band_dir)
+            log.info("    Files in directory: %s...", list_band_dir(band_dir)[:5])  # First 5 files
+            return []
     
-    # Sort tiles by tile number for consistency
-    def extract_tile_number(filename):
-        """Extract tile number from filename: ...tile_XX_R..."""
-        match = re.search(r'tile_(\d+)_', os.path.basename(filename))
-        return int(match.group(1)) if match else 999
+    # Sort tiles row-major so neighbouring VRT sources are read together
+    tile_paths.sort(key=tile_sort_key)
+    return tile_paths
+
+def get_all_bands():
+    """Get list of all Landsat-8 bands from the downloaded folders"""
+    bands = []
     
-    tile_paths.sort(key=extract_tile_number)
+    # Check each band folder exists in your structure
+    for band_name in LANDSAT_BANDS:
+        band_folder = band_name  # e.g., "SR_B2", "SR_B3", etc.
+        band_path = os.path.join(base_dir, band_folder)
+        
+        if os.path.exists(band_path):
+            bands.append((band_folder, band_name))
+            log.info("  ✓ Found folder: %s", band_folder)
+        else:
+            log.warning("  ✗ Missing folder: %s", band_folder)
+    
+    log.info("\nTotal band folders found: %s", len(bands))
+    return bands
+
+def get_crs_info():
+    """Get detailed information about the CRS"""
+    log.info("\nCOORDINATE SYSTEM INFORMATION:")
+    log.info("  Source CRS: %s", SOURCE_CRS)
+    log.info("  Target CRS: %s", TARGET_CRS)
+    log.info("  Resolution: %s meters", TARGET_RESOLUTION)
+    log.info("  Note: No reprojection needed - tiles are already in target CRS")
+    log.info("-" * 60)
+
+def create_mosaic_no_reprojection(tile_paths, band_name):
+    """Create mosaic WITHOUT reprojection and return its metadata dict (None on failure)"""
+    if not tile_paths:
+        return None
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     # Create mosaic file path
-    mosaic_path = os.path.join(output_dir, f'Alberta_2020_L8_{band_name}_NAD83_StatsCan.tif')
+    mosaic_path = mosaic_path_for(band_name)
+    
+    # Remove the band's mosaic from a run with the other MATERIALIZE setting, so steps 02/03
+    # never pick up a stale .tif (or .vrt) next to the fresh one
+    stale_path = os.path.splitext(mosaic_path)[0] + ('.vrt' if MATERIALIZE else '.tif')
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
     
-    print(f"    Found {len(tile_paths)} tiles for {band_name}")
+    log.info("    Found %s tiles for %s", len(tile_paths), band_name)
     
     try:
-        # STEP 1: Create VRT from source tiles (direct merge)
-        print(f"    Step 1: Creating VRT (no reprojection needed)...")
-        vrt_path = os.path.join(output_dir, f'temp_L8_{band_name}.vrt')
+        # STEP 1: Create VRT from source tiles (direct merge); without MATERIALIZE it is the mosaic
+        log.info("    Step 1: Creating VRT (no reprojection needed)...")
+        vrt_path = os.path.join(output_dir, f'temp_L8_{band_name}.vrt') if MATERIALIZE else mosaic_path
         
         # Build VRT - since all tiles are same CRS, this works directly
         vrt_options = gdal.BuildVRTOptions(
@@ -114,11 +211,11 @@ def create_mosaic_no_reprojection(band_folder, band_name):
             VRTNodata=0
         )
         
-        print(f"    Creating VRT with {len(tile_paths)} tiles...")
+        log.info("    Creating VRT with %s tiles...", len(tile_paths))
         vrt = gdal.BuildVRT(vrt_path, tile_paths, options=vrt_options)
         
         if vrt is None:
-            print(f"    ERROR: Failed to create VRT for {band_name}")
+            log.error("    ERROR: Failed to create VRT for %s", band_name)
             return None
             
         # Flush to disk
@@ -128,7 +225,7 @@ def create_mosaic_no_reprojection(band_folder, band_name):
         # STEP 2: Check VRT properties
         vrt_ds = gdal.Open(vrt_path)
         if not vrt_ds:
-            print(f"    ERROR: Cannot open VRT file")
+            log.error("    ERROR: Cannot open VRT file")
             if os.path.exists(vrt_path):
                 os.remove(vrt_path)
             return None
@@ -136,33 +233,52 @@ def create_mosaic_no_reprojection(band_folder, band_name):
         vrt_width = vrt_ds.RasterXSize
         vrt_height = vrt_ds.RasterYSize
         vrt_gt = vrt_ds.GetGeoTransform()
+        vrt_data_type = gdal.GetDataTypeName(vrt_ds.GetRasterBand(1).DataType)
         vrt_ds = None
         
-        print(f"    VRT created: {vrt_width} x {vrt_height} pixels")
+        log.info("    VRT created: %s x %s pixels", vrt_width, vrt_height)
         
-        # STEP 3: Translate VRT to GeoTIFF
-        print(f"    Step 2: Creating final GeoTIFF mosaic...")
+        if not MATERIALIZE:
+            log.info("    ✓ SUCCESS: Created Landsat-8 VRT mosaic for %s", band_name)
+            log.info("      Dimensions: %s × %s pixels", format(vrt_width, ","), format(vrt_height, ","))
+            log.info("      Resolution: %.2fm × %.2fm", vrt_gt[1], -vrt_gt[5])
+            return {
+                'path': mosaic_path,
+                'width': vrt_width,
+                'height': vrt_height,
+                'transform': vrt_gt,
+                'data_type': vrt_data_type,
+                'size_mb': os.path.getsize(mosaic_path) / (1024 * 1024)
+            }
+        
+        # STEP 3: Copy VRT to GeoTIFF
+        log.info("    Step 2: Creating final COG mosaic...")
         
         # For Landsat-8 tiles from your GEE script, they should be aligned
-        # Use translate for speed (no reprojection needed)
+        # Same CRS and grid, so warp is a plain copy; unlike translate it decodes source tiles in parallel.
+        # The COG driver can only copy a finished dataset, so the warp stays an in-memory VRT that the
+        # COG translate pulls from (no temporary GeoTIFF)
+        warp_options = gdal.WarpOptions(
+            format='VRT',
+            multithread=True,
+            warpOptions=['NUM_THREADS=2'],
+            warpMemoryLimit=WARP_MEMORY_MB,
+            srcNodata=0,
+            dstNodata=0,
+            resampleAlg='near'
+        )
         translate_options = gdal.TranslateOptions(
-            format='GTiff',
-            creationOptions=[
-                'COMPRESS=LZW',
-                'PREDICTOR=2',
-                'TILED=YES',
-                'BLOCKXSIZE=256',
-                'BLOCKYSIZE=256',
-                'BIGTIFF=YES',
-                'NUM_THREADS=ALL_CPUS'
-            ]
+            format='COG',
+            creationOptions=MOSAIC_CREATION_OPTIONS
         )
         
-        print(f"    Translating VRT to GeoTIFF...")
-        ds = gdal.Translate(mosaic_path, vrt_path, options=translate_options)
+        log.info("    Warping VRT to COG...")
+        warped_ds = gdal.Warp('', vrt_path, options=warp_options)
+        ds = gdal.Translate(mosaic_path, warped_ds, options=translate_options)
+        warped_ds = None
         
         if ds is None:
-            print(f"    ERROR: Failed to create GeoTIFF for {band_name}")
+            log.error("    ERROR: Failed to create GeoTIFF for %s", band_name)
             if os.path.exists(vrt_path):
                 os.remove(vrt_path)
             return None
@@ -183,7 +299,8 @@ def create_mosaic_no_reprojection(band_folder, band_name):
         band = ds.GetRasterBand(1)
         data_type = gdal.GetDataTypeName(band.DataType)
         no_data = band.GetNoDataValue()
-        min_val, max_val, mean_val, std_val = band.ComputeStatistics(False)
+        if VERBOSE_STATS:
+            min_val, max_val, mean_val, std_val = band.ComputeStatistics(False)
         
         # Calculate bounds
         minx = transform[0]
@@ -204,29 +321,43 @@ def create_mosaic_no_reprojection(band_folder, band_name):
         if os.path.exists(mosaic_path):
             file_size_mb = os.path.getsize(mosaic_path) / (1024 * 1024)
             
-            print(f"    ✓ SUCCESS: Created Landsat-8 mosaic for {band_name}")
-            print(f"      Dimensions: {width:,} × {height:,} pixels")
-            print(f"      File size: {file_size_mb:.1f} MB")
-            print(f"      Data type: {data_type}")
-            print(f"      NoData value: {no_data}")
-            print(f"      Value range: {min_val:.1f} to {max_val:.1f}")
-            print(f"      CRS: {crs_auth}:{crs_code}")
-            print(f"      Resolution: {transform[1]:.2f}m × {-transform[5]:.2f}m")
-            print(f"      Bounds (m): [{minx:,.0f}, {miny:,.0f}] to [{maxx:,.0f}, {maxy:,.0f}]")
-            print(f"      Approx area: {area_km2:,.0f} km²")
+            # One multi-line record, so a band's report stays together among the parallel workers
+            report = [
+                f"    ✓ SUCCESS: Created Landsat-8 mosaic for {band_name}",
+                f"      Dimensions: {width:,} × {height:,} pixels",
+                f"      File size: {file_size_mb:.1f} MB",
+                f"      Data type: {data_type}",
+                f"      NoData value: {no_data}",
+            ]
+            if VERBOSE_STATS:
+                report.append(f"      Value range: {min_val:.1f} to {max_val:.1f}")
+            report += [
+                f"      CRS: {crs_auth}:{crs_code}",
+                f"      Resolution: {transform[1]:.2f}m × {-transform[5]:.2f}m",
+                f"      Bounds (m): [{minx:,.0f}, {miny:,.0f}] to [{maxx:,.0f}, {maxy:,.0f}]",
+                f"      Approx area: {area_km2:,.0f} km²",
+            ]
+            log.info("\n".join(report))
             
-            return mosaic_path
+            return {
+                'path': mosaic_path,
+                'width': width,
+                'height': height,
+                'transform': transform,
+                'data_type': data_type,
+                'size_mb': file_size_mb
+            }
         else:
-            print(f"    ERROR: Mosaic file was not created")
+            log.error("    ERROR: Mosaic file was not created")
             return None
         
     except Exception as e:
-        print(f"    ERROR processing {band_name}: {str(e)}")
+        log.error("    ERROR processing %s: %s", band_name, e)
         import traceback
         traceback.print_exc()
         
-        # Clean up temp file
-        vrt_path = os.path.join(output_dir, f'temp_L8_{band_name}.vrt')
+        # Clean up temp file (or the incomplete VRT mosaic)
+        vrt_path = os.path.join(output_dir, f'temp_L8_{band_name}.vrt') if MATERIALIZE else mosaic_path_for(band_name)
         if os.path.exists(vrt_path):
             try:
                 os.remove(vrt_path)
@@ -240,6 +371,10 @@ def check_tile_crs(tile_path):
         ds = gdal.Open(tile_path)
         if ds:
             crs_wkt = ds.GetProjection()
+            # Expected CRS: a substring check avoids building a SpatialReference
+            if EXPECTED_CRS_WKT_AUTHORITY in crs_wkt:
+                ds = None
+                return TARGET_CRS
             srs = osr.SpatialReference()
             srs.ImportFromWkt(crs_wkt)
             auth = srs.GetAuthorityName(None)
@@ -250,23 +385,19 @@ def check_tile_crs(tile_path):
         pass
     return "Error reading"
 
-def verify_all_tiles_crs(band_folder, band_name):
+def verify_all_tiles_crs(tile_paths):
     """Verify that all tiles are in the expected CRS"""
-    band_dir = os.path.join(base_dir, band_folder)
-    pattern = os.path.join(band_dir, f'Alberta_2020_L8_SR_{band_name}_tile_*.tif')
-    tile_paths = glob.glob(pattern)
-    
     if not tile_paths:
         return False, "No tiles found"
     
-    print(f"    Checking CRS for {len(tile_paths)} tiles...")
+    log.info("    Checking CRS for %s tiles...", len(tile_paths))
     
-    # Check first 3 tiles
+    # The GEE export writes every tile in one CRS, so the first tile stands for the band
     crs_list = []
-    for tile in tile_paths[:3]:
+    for tile in tile_paths[:1]:
         crs = check_tile_crs(tile)
         crs_list.append(crs)
-        print(f"      {os.path.basename(tile)}: {crs}")
+        log.info("      %s: %s", os.path.basename(tile), crs)
     
     # Check if all CRS are the same and match expected
     expected_crs = "EPSG:3979"
@@ -283,38 +414,70 @@ def verify_all_tiles_crs(band_folder, band_name):
 
 def show_sample_tile_names():
     """Show sample tile names to verify pattern"""
-    print("\nSAMPLE TILE NAMES (verifying pattern):")
-    print("-" * 60)
+    log.info("\nSAMPLE TILE NAMES (verifying pattern):")
+    log.info("-" * 60)
     
     for band_name in LANDSAT_BANDS[:2]:  # Check first 2 bands
         band_dir = os.path.join(base_dir, band_name)
         if os.path.exists(band_dir):
-            pattern = os.path.join(band_dir, f'Alberta_2020_L8_SR_{band_name}_tile_*.tif')
-            files = glob.glob(pattern)
+            files = band_tile_files(band_dir, band_name)
             if files:
-                print(f"\nBand {band_name}:")
+                log.info("\nBand %s:", band_name)
                 for f in files[:2]:  # Show first 2 files
-                    print(f"  {os.path.basename(f)}")
+                    log.info("  %s", os.path.basename(f))
                 if len(files) > 2:
-                    print(f"  ... and {len(files)-2} more files")
+                    log.info("  ... and %s more files", len(files)-2)
             else:
-                print(f"\nBand {band_name}: No files matching pattern")
+                log.info("\nBand %s: No files matching pattern", band_name)
         else:
-            print(f"\nBand {band_name}: Directory not found")
-    print("-" * 60)
+            log.info("\nBand %s: Directory not found", band_name)
+    log.info("-" * 60)
+
+def configure_logging():
+    """Send l8_mosaic records to the console and the buffered log file"""
+    os.makedirs(output_dir, exist_ok=True)
+    formatter = logging.Formatter('%(message)s')
+    
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    
+    file_handler = logging.FileHandler(os.path.join(output_dir, LOG_FILE), mode='w', encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    buffered_handler = logging.handlers.MemoryHandler(
+        LOG_BUFFER_RECORDS, flushLevel=logging.ERROR, target=file_handler
+    )
+    
+    log.handlers[:] = [console_handler, buffered_handler]
+    log.setLevel(os.environ.get('MOSAIC_LOG_LEVEL', 'INFO').upper())
+    log.propagate = False
+
+def init_worker_logging(log_queue, level):
+    """Forward a band worker's l8_mosaic records to the parent process through log_queue"""
+    log.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    log.setLevel(level)
+    log.propagate = False
+
+def process_one_band(tile_paths, band_name):
+    """Verify tile CRS and create the mosaic for one band (runs in its own process)"""
+    gdal.UseExceptions()
+    gdal.SetCacheMax(MOSAIC_CACHE_MB // MAX_BAND_WORKERS * 1024 * 1024)
+    
+    ok, message = verify_all_tiles_crs(tile_paths)
+    mosaic_info = create_mosaic_no_reprojection(tile_paths, band_name)
+    return ok, message, mosaic_info
 
 def process_landsat8_bands():
     """Process all Landsat-8 bands"""
-    print("=" * 80)
-    print("PROCESSING LANDSAT-8 BANDS - YOUR EXACT STRUCTURE")
-    print("=" * 80)
-    print(f"Base directory: {base_dir}")
-    print(f"Folder structure: D:\\Alberta_L8_2020\\SR_B2\\ (etc.)")
-    print(f"File pattern: Alberta_2020_L8_SR_SR_B2_tile_0_R0C1.tif")
-    print(f"Output directory: {output_dir}")
-    print(f"CRS: {TARGET_CRS} (NAD83 / Statistics Canada Lambert)")
-    print(f"Resolution: {TARGET_RESOLUTION} meters")
-    print("=" * 80)
+    log.info("=" * 80)
+    log.info("PROCESSING LANDSAT-8 BANDS - YOUR EXACT STRUCTURE")
+    log.info("=" * 80)
+    log.info("Base directory: %s", base_dir)
+    log.info("Folder structure: D:\\Alberta_L8_2020\\SR_B2\\ (etc.)")
+    log.info("File pattern: Alberta_2020_L8_SR_SR_B2_tile_0_R0C1.tif")
+    log.info("Output directory: %s", output_dir)
+    log.info("CRS: %s (NAD83 / Statistics Canada Lambert)", TARGET_CRS)
+    log.info("Resolution: %s meters", TARGET_RESOLUTION)
+    log.info("=" * 80)
     
     # Show sample tile names to verify pattern
     show_sample_tile_names()
@@ -326,160 +489,165 @@ def process_landsat8_bands():
     bands = get_all_bands()
     
     if not bands:
-        print("\nERROR: No band folders found!")
-        print(f"Checked in: {base_dir}")
-        print(f"Expected folders: {LANDSAT_BANDS}")
-        print(f"Current directories in base path:")
+        log.error("\nERROR: No band folders found!")
+        log.info("Checked in: %s", base_dir)
+        log.info("Expected folders: %s", LANDSAT_BANDS)
+        log.info("Current directories in base path:")
         for item in os.listdir(base_dir):
-            print(f"  - {item}")
+            log.info("  - %s", item)
         return
     
-    print(f"\nFound {len(bands)} Landsat-8 bands to process")
+    log.info("\nFound %s Landsat-8 bands to process", len(bands))
+    
+    # Scan each band folder once
+    band_tiles = {band_name: find_band_tiles(band_folder, band_name) for band_folder, band_name in bands}
     
     # Verify CRS for each band
-    print("\nVerifying tile CRS (first 2 bands only)...")
+    log.info("\nVerifying tile CRS (first 2 bands only)...")
     for band_folder, band_name in bands[:2]:  # Check first 2 bands
-        ok, message = verify_all_tiles_crs(band_folder, band_name)
+        ok, message = verify_all_tiles_crs(band_tiles[band_name])
         status = "✓" if ok else "✗"
-        print(f"  {status} {band_name}: {message}")
+        log.info("  %s %s: %s", status, band_name, message)
         if not ok:
-            print(f"    WARNING: CRS mismatch may cause issues!")
+            log.warning("    WARNING: CRS mismatch may cause issues!")
     
-    print("\nStarting mosaic creation...")
-    print("-" * 80)
+    log.info("\nStarting mosaic creation...")
+    log.info("-" * 80)
     
     successful_bands = []
     failed_bands = []
-    
-    # Process each band
-    for idx, (band_folder, band_name) in enumerate(bands, 1):
-        print(f"\n[{idx:2d}/{len(bands)}] Landsat-8 Band {band_name}")
+    # Metadata returned by create_mosaic_no_reprojection, so mosaics are never re-opened for the report
+    mosaic_infos = {}
+    
+    # Process bands in parallel; results are reported in band order
+    log.info("Mosaicking %s bands with %s parallel processes...", len(bands), MAX_BAND_WORKERS)
+    # Worker records are written by one listener thread here, so processes never share the console
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *log.handlers)
+    listener.start()
+    
+    with ProcessPoolExecutor(max_workers=MAX_BAND_WORKERS, initializer=init_worker_logging,
+                             initargs=(log_queue, log.level)) as executor:
+        futures = [executor.submit(process_one_band, band_tiles[band_name], band_name)
+                   for band_folder, band_name in bands]
         
-        try:
-            # Verify CRS first
-            ok, message = verify_all_tiles_crs(band_folder, band_name)
-            if not ok:
-                print(f"  ✗ CRS verification failed: {message}")
-                failed_bands.append((band_name, f"CRS issue: {message}"))
-                # You can choose to continue or not
-                print(f"  ⚠️ Continuing anyway...")
+        for idx, ((band_folder, band_name), future) in enumerate(zip(bands, futures), 1):
+            log.info("\n[%2d/%s] Landsat-8 Band %s", idx, len(bands), band_name)
             
-            # Create mosaic
-            mosaic_path = create_mosaic_no_reprojection(band_folder, band_name)
-            
-            if mosaic_path is None:
-                print(f"  ✗ Failed to create mosaic for {band_name}")
-                failed_bands.append((band_name, "Mosaic creation failed"))
-            else:
-                successful_bands.append(band_name)
+            try:
+                ok, message, mosaic_info = future.result()
+                if not ok:
+                    log.warning("  ✗ CRS verification failed: %s", message)
+                    failed_bands.append((band_name, f"CRS issue: {message}"))
+                    # You can choose to continue or not
+                    log.warning("  ⚠️ Continuing anyway...")
                 
-        except Exception as e:
-            print(f"  ✗ Error processing {band_name}: {str(e)}")
-            failed_bands.append((band_name, str(e)))
+                if mosaic_info is None:
+                    log.error("  ✗ Failed to create mosaic for %s", band_name)
+                    failed_bands.append((band_name, "Mosaic creation failed"))
+                else:
+                    successful_bands.append(band_name)
+                    mosaic_infos[band_name] = mosaic_info
+                    
+            except Exception as e:
+                log.error("  ✗ Error processing %s: %s", band_name, e)
+                failed_bands.append((band_name, str(e)))
+    
+    listener.stop()
     
     # Summary
-    print("\n" + "=" * 80)
-    print("PROCESSING COMPLETE - SUMMARY")
-    print("=" * 80)
-    print(f"Total Landsat-8 bands: {len(bands)}")
-    print(f"Successful: {len(successful_bands)}")
-    print(f"Failed: {len(failed_bands)}")
+    log.info("\n" + "=" * 80)
+    log.info("PROCESSING COMPLETE - SUMMARY")
+    log.info("=" * 80)
+    log.info("Total Landsat-8 bands: %s", len(bands))
+    log.info("Successful: %s", len(successful_bands))
+    log.info("Failed: %s", len(failed_bands))
     
     if successful_bands:
-        print(f"\nSuccessful bands:")
+        log.info("\nSuccessful bands:")
         for band in successful_bands:
-            print(f"  ✓ {band}")
+            log.info("  ✓ %s", band)
             # Show output file path
-            mosaic_file = os.path.join(output_dir, f'Alberta_2020_L8_{band}_NAD83_StatsCan.tif')
-            if os.path.exists(mosaic_file):
-                size_mb = os.path.getsize(mosaic_file) / (1024 * 1024)
-                print(f"      → {os.path.basename(mosaic_file)} ({size_mb:.1f} MB)")
+            info = mosaic_infos[band]
+            log.info("      → %s (%.1f MB)", os.path.basename(info['path']), info['size_mb'])
     
     if failed_bands:
-        print(f"\nFailed bands:")
+        log.info("\nFailed bands:")
         for band, reason in failed_bands:
-            print(f"  ✗ {band}: {reason}")
+            log.warning("  ✗ %s: %s", band, reason)
     
-    print(f"\nOutput directory: {output_dir}")
+    log.info("\nOutput directory: %s", output_dir)
     
     # Create a summary file
     summary_path = os.path.join(output_dir, 'landsat8_mosaics_summary.txt')
+    lines = [
+        "LANDSAT-8 ALBERTA 2020 MOSAIC PROCESSING SUMMARY",
+        "=" * 70,
+        f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Base directory: {base_dir}",
+        f"Output directory: {output_dir}",
+        f"CRS: {TARGET_CRS} (NAD83 / Statistics Canada Lambert)",
+        f"Resolution: {TARGET_RESOLUTION} meters",
+        f"File pattern: Alberta_2020_L8_SR_[BAND]_tile_*.tif",
+        f"Total bands attempted: {len(bands)}",
+        f"Successful: {len(successful_bands)}",
+        f"Failed: {len(failed_bands)}",
+        "",
+        "SUCCESSFUL BANDS:",
+        "-" * 30,
+    ]
+    for band in successful_bands:
+        mosaic_file = os.path.basename(mosaic_infos[band]['path'])
+        lines.append(f"{band}: {mosaic_file}")
+    
+    if failed_bands:
+        lines += ["", "FAILED BANDS:", "-" * 30]
+        for band, reason in failed_bands:
+            lines.append(f"{band}: {reason}")
+    
+    lines += ["", "DIRECTORY STRUCTURE:", "-" * 30, f"Base: {base_dir}"]
+    for band_folder, _ in bands:
+        lines.append(f"  ├── {band_folder}/")
+        lines.append(f"  │   └── Alberta_2020_L8_SR_{band_folder}_tile_*.tif")
+    lines.append(f"  └── {os.path.basename(output_dir)}/")
+    lines.append(f"      └── Alberta_2020_L8_[BAND]_NAD83_StatsCan.{'tif' if MATERIALIZE else 'vrt'}")
+    
+    # Built in memory and written in one call
     with open(summary_path, 'w') as f:
-        f.write("LANDSAT-8 ALBERTA 2020 MOSAIC PROCESSING SUMMARY\n")
-        f.write("=" * 70 + "\n")
-        f.write(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Base directory: {base_dir}\n")
-        f.write(f"Output directory: {output_dir}\n")
-        f.write(f"CRS: {TARGET_CRS} (NAD83 / Statistics Canada Lambert)\n")
-        f.write(f"Resolution: {TARGET_RESOLUTION} meters\n")
-        f.write(f"File pattern: Alberta_2020_L8_SR_[BAND]_tile_*.tif\n")
-        f.write(f"Total bands attempted: {len(bands)}\n")
-        f.write(f"Successful: {len(successful_bands)}\n")
-        f.write(f"Failed: {len(failed_bands)}\n\n")
-        
-        f.write("SUCCESSFUL BANDS:\n")
-        f.write("-" * 30 + "\n")
-        for band in successful_bands:
-            mosaic_file = f'Alberta_2020_L8_{band}_NAD83_StatsCan.tif'
-            f.write(f"{band}: {mosaic_file}\n")
-        
-        if failed_bands:
-            f.write("\nFAILED BANDS:\n")
-            f.write("-" * 30 + "\n")
-            for band, reason in failed_bands:
-                f.write(f"{band}: {reason}\n")
-        
-        f.write("\nDIRECTORY STRUCTURE:\n")
-        f.write("-" * 30 + "\n")
-        f.write(f"Base: {base_dir}\n")
-        for band_folder, _ in bands:
-            f.write(f"  ├── {band_folder}/\n")
-            f.write(f"  │   └── Alberta_2020_L8_SR_{band_folder}_tile_*.tif\n")
-        f.write(f"  └── {os.path.basename(output_dir)}/\n")
-        f.write(f"      └── Alberta_2020_L8_[BAND]_NAD83_StatsCan.tif\n")
+        f.write("\n".join(lines) + "\n")
     
-    print(f"\nDetailed summary saved to: {summary_path}")
+    log.info("\nDetailed summary saved to: %s", summary_path)
     
     # Show example file info
     if successful_bands:
         example_band = successful_bands[0]
-        example_file = os.path.join(output_dir, f'Alberta_2020_L8_{example_band}_NAD83_StatsCan.tif')
-        if os.path.exists(example_file):
-            print(f"\nEXAMPLE OUTPUT FILE:")
-            print(f"  File: {os.path.basename(example_file)}")
-            try:
-                ds = gdal.Open(example_file)
-                if ds:
-                    width = ds.RasterXSize
-                    height = ds.RasterYSize
-                    transform = ds.GetGeoTransform()
-                    band = ds.GetRasterBand(1)
-                    data_type = gdal.GetDataTypeName(band.DataType)
-                    
-                    # Calculate bounds
-                    minx = transform[0]
-                    maxx = minx + width * transform[1]
-                    maxy = transform[3]
-                    miny = maxy + height * transform[5]
-                    
-                    ds = None
-                    
-                    print(f"  Dimensions: {width:,} × {height:,} pixels")
-                    print(f"  Data type: {data_type}")
-                    print(f"  Resolution: {transform[1]:.2f}m × {-transform[5]:.2f}m")
-                    print(f"  Bounds X: {minx:,.0f} to {maxx:,.0f}")
-                    print(f"  Bounds Y: {miny:,.0f} to {maxy:,.0f}")
-                    print(f"  Width: {(maxx-minx)/1000:.0f} km")
-                    print(f"  Height: {(maxy-miny)/1000:.0f} km")
-                    
-            except Exception as e:
-                print(f"  Error reading example file: {str(e)}")
-    
-    print("=" * 80)
+        info = mosaic_infos[example_band]
+        width = info['width']
+        height = info['height']
+        transform = info['transform']
+        
+        # Calculate bounds
+        minx = transform[0]
+        maxx = minx + width * transform[1]
+        maxy = transform[3]
+        miny = maxy + height * transform[5]
+        
+        log.info("\nEXAMPLE OUTPUT FILE:")
+        log.info("  File: %s", os.path.basename(info['path']))
+        log.info("  Dimensions: %s × %s pixels", format(width, ","), format(height, ","))
+        log.info("  Data type: %s", info['data_type'])
+        log.info("  Resolution: %.2fm × %.2fm", transform[1], -transform[5])
+        log.info("  Bounds X: %s to %s", format(minx, ",.0f"), format(maxx, ",.0f"))
+        log.info("  Bounds Y: %s to %s", format(miny, ",.0f"), format(maxy, ",.0f"))
+        log.info("  Width: %.0f km", (maxx-minx)/1000)
+        log.info("  Height: %.0f km", (maxy-miny)/1000)
+    
+    log.info("=" * 80)
 
 # Main execution
 if __name__ == "__main__":
     gdal.UseExceptions()
+    configure_logging()
     
     print("LANDSAT-8 ALBERTA 2020 MOSAIC CREATION")
     print("=" * 80)
@@ -3,12 +3,25 @@ from osgeo import gdal
 
 gdal.UseExceptions()
 
+# Decode source blocks on all cores
+gdal.SetConfigOption("GDAL_NUM_THREADS", "ALL_CPUS")
+
+# 2 GB block cache so the six-band VRT keeps source blocks resident while the stack is written;
+# the VSI read cache is per open file (six band inputs)
+gdal.SetCacheMax(2048 * 1024 * 1024)
+gdal.SetConfigOption("VSI_CACHE", "TRUE")
+gdal.SetConfigOption("VSI_CACHE_SIZE", str(128 * 1024 * 1024))
+
 # =====================================================
 # PATHS
 # =====================================================
 # Input directory with clipped Landsat-8 bands
 input_dir = r"D:\Hackathon15_AlphaEarth\Alberta_L8_2020\Alberta_2020_NAD83_StatsCan_L8_30m_Mosaics_EPSG_3979_Clipped"
 
+# Per-band mosaics from step 01 (.tif or .vrt) and the Alberta boundary, used when clipping while stacking
+mosaic_dir = r"D:\Hackathon15_AlphaEarth\Alberta_L8_2020\Alberta_2020_NAD83_StatsCan_L8_30m_Mosaics_EPSG_3979"
+alberta_gpkg = r"D:\Hackathon15_AlphaEarth\AlphaEarth_Dataset\Alberta_EPSG_3979.gpkg"
+
 # Output directory for stacked image
 output_dir = r"D:\Hackathon15_AlphaEarth\Alberta_L8_2020\Alberta_2020_NAD83_StatsCan_L8_30m_Mosaics_EPSG_3979_Clipped_Stack"
 
@@ -28,6 +41,36 @@ landsat_bands = [
     "SR_B7",  # SWIR2
 ]
 
+# COG creation options for the stack (same ZSTD settings as the mosaics); the COG driver
+# writes the AVERAGE overviews ahead of the full-resolution data, copying the band inputs'
+# overviews instead of recomputing them when every input has them
+STACK_CREATION_OPTIONS = [
+    "COMPRESS=ZSTD",
+    "LEVEL=1",
+    "PREDICTOR=YES",
+    "BLOCKSIZE=512",
+    "BIGTIFF=IF_SAFER",
+    "NUM_THREADS=ALL_CPUS",
+    "OVERVIEWS=AUTO",
+    "OVERVIEW_RESAMPLING=AVERAGE"
+]
+
+# False (default, same as the Sentinel-2 stacker) stacks the per-band _CLIPPED.tif files of step 02.
+# True bypasses step 02: the step-01 mosaics are clipped to Alberta and stacked in one warp, so
+# clip_merged_Landsat8_30m_images_02.py does not need to run
+CLIP_WHILE_STACKING = False
+
+def band_input_path(band):
+    """Input file of one band: the step-01 mosaic when clipping while stacking, else the step-02 clip"""
+    if CLIP_WHILE_STACKING:
+        # Step-01 mosaic, GeoTIFF or VRT (the newer one if a stale copy of the other is left)
+        stem = os.path.join(mosaic_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan")
+        candidates = [stem + ext for ext in (".tif", ".vrt") if os.path.exists(stem + ext)]
+        return max(candidates, key=os.path.getmtime) if candidates else stem + ".tif"
+    
+    # Pattern for clipped Landsat-8 files
+    return os.path.join(input_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif")
+
 # =====================================================
 # CREATE STACKED IMAGE
 # =====================================================
@@ -36,7 +79,7 @@ def stack_landsat_bands():
     print("=" * 70)
     print("STACKING LANDSAT-8 BANDS")
     print("=" * 70)
-    print(f"Input directory: {input_dir}")
+    print(f"Input directory: {mosaic_dir if CLIP_WHILE_STACKING else input_dir}")
     print(f"Output file: {output_file}")
     print(f"Bands to stack: {len(landsat_bands)}")
     print("Band order: Blue, Green, Red, NIR, SWIR1, SWIR2")
@@ -47,8 +90,7 @@ def stack_landsat_bands():
     missing_bands = []
     
     for band in landsat_bands:
-        # Pattern for clipped Landsat-8 files
-        input_file = os.path.join(input_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif")
+        input_file = band_input_path(band)
         
         if os.path.exists(input_file):
             band_files.append(input_file)
@@ -59,7 +101,10 @@ def stack_landsat_bands():
     
     if missing_bands:
         print(f"\nERROR: Missing {len(missing_bands)} band(s): {missing_bands}")
-        print("Please make sure all bands are clipped before stacking.")
+        if CLIP_WHILE_STACKING:
+            print("Please make sure all band mosaics are created before stacking.")
+        else:
+            print("Please make sure all bands are clipped before stacking.")
         return False
     
     if len(band_files) != 6:
@@ -85,25 +130,40 @@ def stack_landsat_bands():
             return False
         vrt = None  # Close VRT
         
-        print("Step 2: Converting VRT to stacked TIFF...")
+        if CLIP_WHILE_STACKING:
+            print("Step 2: Clipping VRT to Alberta into stacked COG...")
+            
+            # Same clip settings as step 02, applied to all bands at once. The warp stays an
+            # in-memory VRT because the COG driver can only copy a finished dataset
+            warp_options = gdal.WarpOptions(
+                format="VRT",
+                cutlineDSName=alberta_gpkg,
+                cropToCutline=True,
+                dstNodata=0,
+                resampleAlg='near',
+                multithread=True,
+                warpOptions=["NUM_THREADS=ALL_CPUS"],
+                xRes=30,
+                yRes=30,
+                targetAlignedPixels=False
+            )
+            
+            source = gdal.Warp("", vrt_file, options=warp_options)
+        else:
+            print("Step 2: Converting VRT to stacked COG...")
+            source = vrt_file
         
         translate_options = gdal.TranslateOptions(
-            format='GTiff',
-            creationOptions=[
-                'COMPRESS=LZW',
-                'PREDICTOR=2',
-                'TILED=YES',
-                'BLOCKXSIZE=256',
-                'BLOCKYSIZE=256',
-                'BIGTIFF=YES',
-                'NUM_THREADS=ALL_CPUS'
-            ]
+            format='COG',
+            creationOptions=STACK_CREATION_OPTIONS
         )
         
-        ds = gdal.Translate(output_file, vrt_file, options=translate_options)
+        ds = gdal.Translate(output_file, source, options=translate_options)
+        source = None
         if ds is None:
             print("ERROR: Failed to create stacked TIFF")
             return False
+        ds = None
         
         # Clean up temporary VRT
         if os.path.exists(vrt_file):
@@ -193,7 +253,7 @@ def verify_band_alignment():
     band_info = {}
     
     for band in landsat_bands:
-        input_file = os.path.join(input_dir, f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif")
+        input_file = band_input_path(band)
         
         if not os.path.exists(input_file):
             print(f"✗ Missing: {band}")
@@ -256,13 +316,14 @@ def verify_band_alignment():
 if __name__ == "__main__":
     print("LANDSAT-8 BAND STACKING TOOL")
     print("=" * 70)
-    print(f"Input clipped bands: {input_dir}")
+    source_dir = mosaic_dir if CLIP_WHILE_STACKING else input_dir
+    print(f"Input {'band mosaics' if CLIP_WHILE_STACKING else 'clipped bands'}: {source_dir}")
     print(f"Output stacked file: {output_file}")
     print("=" * 70)
     
     # Check if input directory exists
-    if not os.path.exists(input_dir):
-        print(f"ERROR: Input directory not found: {input_dir}")
+    if not os.path.exists(source_dir):
+        print(f"ERROR: Input directory not found: {source_dir}")
         exit(1)
     
     # Create output directory
@@ -314,7 +375,7 @@ if __name__ == "__main__":
         print("2. Band files have different dimensions")
         print("3. Band files have different CRS")
         print("4. Insufficient disk space")
-        print("\nPlease check the input directory contains all 6 clipped bands:")
+        print("\nPlease check the input directory contains all 6 bands:")
         for band in landsat_bands:
-            expected_file = f"Alberta_2020_L8_{band}_NAD83_StatsCan_CLIPPED.tif"
+            expected_file = os.path.basename(band_input_path(band))
             print(f"  - {expected_file}")
\ No newline at end of file
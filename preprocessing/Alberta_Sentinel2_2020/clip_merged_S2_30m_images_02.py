@@ -1,5 +1,5 @@
 import os
-import glob
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import gdal, ogr
 
 gdal.UseExceptions()
@@ -33,9 +33,226 @@ sentinel_bands = [
     "B12",  # SWIR 2
 ]
 
+# GeoTIFF creation options for every clipped band: ZSTD level 1 like the Landsat-8 outputs
+# (much faster to encode and decode than LZW), PREDICTOR=2 for the integer reflectance,
+# and 512x512 blocks to match how rasterio/QGIS stream tiles. Bands are clipped in parallel
+# processes, so each encoder gets 2 threads rather than ALL_CPUS
+CLIP_CREATION_OPTIONS = [
+    "COMPRESS=ZSTD",
+    "ZSTD_LEVEL=1",
+    "PREDICTOR=2",
+    "TILED=YES",
+    "BLOCKXSIZE=512",
+    "BLOCKYSIZE=512",
+    "BIGTIFF=YES",
+    "NUM_THREADS=2"
+]
+
+# Processing option, so the script runs unattended: S2_CLIP_MODE=individual clips the known
+# bands (B2 to B12), S2_CLIP_MODE=batch clips every Sentinel-2 mosaic found in mosaic_dir
+clip_mode = os.environ.get("S2_CLIP_MODE", "individual").lower()
+
+# Clipped bands already in output_dir are reused, so an interrupted run resumes where it stopped;
+# S2_CLIP_OVERWRITE=1 clips every band again
+overwrite_clips = os.environ.get("S2_CLIP_OVERWRITE") == "1"
+
+# Each band is an independent input/output pair, so clip up to one band per core
+MAX_CLIP_WORKERS = min(len(sentinel_bands), os.cpu_count() or 1)
+
+# GDAL settings, applied again in every worker when it imports this module:
+# a quarter of RAM for the block cache, split between the clip processes,
+# no sidecar-file directory listing on each open (mosaic_dir holds many files),
+# cached reads of the mosaics, and 2 decode threads per process
+gdal.SetConfigOption("GDAL_CACHEMAX", f"{max(1, 25 // MAX_CLIP_WORKERS)}%")
+gdal.SetConfigOption("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+gdal.SetConfigOption("VSI_CACHE", "TRUE")
+gdal.SetConfigOption("GDAL_NUM_THREADS", "2")
+
+# Warp working buffer per clip process (MB); stays well below the 2000 MB where -wm stops helping
+WARP_MEMORY_MB = 512
+
+# Alberta boundary rasterized once on the 30m clip grid and shared by all band clips
+cutline_mask_file = os.path.join(output_dir, "Alberta_EPSG_3979_mask_30m.tif")
+
+# =====================================================
+# RASTERIZED CUTLINE MASK
+# =====================================================
+def build_cutline_mask():
+    """Rasterize the Alberta boundary to a 30m Byte mask (1 inside, 0 outside), cached on disk"""
+    # Rebuilt whenever the boundary file has been edited since the mask was made
+    if (not os.path.exists(cutline_mask_file)
+            or os.path.getmtime(alberta_gpkg) > os.path.getmtime(cutline_mask_file)):
+        print(f"Rasterizing Alberta boundary to {os.path.basename(cutline_mask_file)}...")
+        # Renamed into place once complete, so an interrupted rasterize never leaves a usable mask
+        partial_file = cutline_mask_file + ".partial"
+        ds = gdal.Rasterize(
+            partial_file,
+            alberta_gpkg,
+            format="GTiff",
+            xRes=30,  # Same grid as cropToCutline with xRes=30, yRes=30
+            yRes=30,
+            burnValues=[1],
+            initValues=[0],
+            outputType=gdal.GDT_Byte,
+            creationOptions=["COMPRESS=ZSTD", "TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512"]
+        )
+        ds = None
+        os.replace(partial_file, cutline_mask_file)
+    return cutline_mask_file
+
+def mask_to_cutline(source_path, mask_ds, data_type):
+    """In-memory VRT multiplying a raster on the mask grid by the Alberta mask"""
+    vrt = gdal.GetDriverByName("VRT").Create("", mask_ds.RasterXSize, mask_ds.RasterYSize, 0)
+    vrt.SetGeoTransform(mask_ds.GetGeoTransform())
+    vrt.SetSpatialRef(mask_ds.GetSpatialRef())
+    
+    vrt.AddBand(data_type, ["subClass=VRTDerivedRasterBand", "PixelFunctionType=mul"])
+    band = vrt.GetRasterBand(1)
+    band.SetNoDataValue(0)
+    for i, path in enumerate([source_path, mask_ds.GetDescription()]):
+        band.SetMetadataItem(
+            f"source_{i}",
+            f"<SimpleSource><SourceFilename relativeToVRT=\"0\">{path}</SourceFilename>"
+            f"<SourceBand>1</SourceBand></SimpleSource>",
+            "new_vrt_sources"
+        )
+    return vrt
+
 # =====================================================
 # CLIP EACH SENTINEL-2 BAND SEPARATELY - IDENTICAL TO LANDSAT-8
 # =====================================================
+# Warp/translate options per resampling method, built once per worker process
+_clip_options_cache = {}
+
+def clip_options(resample_alg):
+    """Memoized (WarpOptions, TranslateOptions) for clipping onto the cutline mask grid"""
+    if resample_alg not in _clip_options_cache:
+        mask_ds = gdal.Open(cutline_mask_file)
+        gt = mask_ds.GetGeoTransform()
+        mask_bounds = (gt[0], gt[3] + gt[5] * mask_ds.RasterYSize,
+                       gt[0] + gt[1] * mask_ds.RasterXSize, gt[3])
+        
+        # Lazy warp onto the mask grid (the cutline's bounding box) - IDENTICAL resolution and CRS
+        warp_options = gdal.WarpOptions(
+            format="VRT",
+            outputBounds=mask_bounds,    # Same extent as cropToCutline=True
+            width=mask_ds.RasterXSize,   # 30m pixels - Same as Landsat-8
+            height=mask_ds.RasterYSize,
+            dstNodata=0,                 # Same as Landsat-8
+            resampleAlg=resample_alg,
+            # Thread the warp kernel too, with as many threads as this process's encoder
+            multithread=True,
+            warpOptions=["NUM_THREADS=2", "USE_OPENCL=FALSE"],
+            warpMemoryLimit=WARP_MEMORY_MB
+        )
+        translate_options = gdal.TranslateOptions(format="GTiff", creationOptions=CLIP_CREATION_OPTIONS)
+        mask_ds = None
+        
+        _clip_options_cache[resample_alg] = (warp_options, translate_options)
+    return _clip_options_cache[resample_alg]
+
+def describe_clip(output_file, cached=False):
+    """Summary fields of a clipped band file"""
+    ds = gdal.Open(output_file)
+    gt = ds.GetGeoTransform()
+    raster_band = ds.GetRasterBand(1)
+    info = {
+        'width': ds.RasterXSize,
+        'height': ds.RasterYSize,
+        'data_type': gdal.GetDataTypeName(raster_band.DataType),
+        'no_data': raster_band.GetNoDataValue(),
+        'resolution': gt[1],
+        'crs_preserved': '3979' in ds.GetProjection(),
+        'file_size_mb': os.path.getsize(output_file) / (1024 * 1024),
+        'cached': cached
+    }
+    ds = None
+    return info
+
+def existing_clip_info(input_file, output_file):
+    """Summary of a readable clip left by an earlier run, or None when it has to be (re)made"""
+    if overwrite_clips or not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        return None
+    # A clip older than the mask or its mosaic was cut from a boundary or mosaic that has
+    # since been regenerated
+    clip_mtime = os.path.getmtime(output_file)
+    if clip_mtime < os.path.getmtime(cutline_mask_file) or clip_mtime < os.path.getmtime(input_file):
+        return None
+    try:
+        info = describe_clip(output_file, cached=True)
+    except Exception:
+        return None
+    return info if info['width'] > 0 and info['height'] > 0 else None
+
+def _warp_to_clip(input_file, output_file, resample_alg="near"):
+    """Clip one mosaic to the Alberta mask grid and describe the output for the summary"""
+    info = existing_clip_info(input_file, output_file)
+    if info is not None:
+        return None, info
+    
+    warp_options, translate_options = clip_options(resample_alg)
+    
+    source_vrt = f"/vsimem/{os.path.basename(output_file)}_source.vrt"
+    ds = gdal.Warp(source_vrt, input_file, options=warp_options)
+    data_type = ds.GetRasterBand(1).DataType
+    ds = None
+    
+    # Background and dstNodata are both 0, so multiplying by the mask
+    # is equivalent to the polygon cutline
+    mask_ds = gdal.Open(cutline_mask_file)
+    masked = mask_to_cutline(source_vrt, mask_ds, data_type)
+    # Written under a temporary name, so an interrupted clip is never mistaken for a finished one
+    partial_file = output_file + ".partial"
+    ds = gdal.Translate(partial_file, masked, options=translate_options)
+    ds = None
+    masked = None
+    mask_ds = None
+    gdal.Unlink(source_vrt)
+    
+    # Verify the output - IDENTICAL to Landsat-8
+    if not os.path.exists(partial_file):
+        return "Output file creation failed", None
+    os.replace(partial_file, output_file)
+    
+    return None, describe_clip(output_file)
+
+def _clip_one(band):
+    """Clip a single Sentinel-2 band in a worker process, returning (band, path, error, info)"""
+    # Sentinel-2 files use pattern: Alberta_2020_S2_B2_NAD83_StatsCan.tif
+    input_file = os.path.join(mosaic_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan.tif")
+    output_file = os.path.join(output_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan_CLIPPED.tif")
+    
+    if not os.path.exists(input_file):
+        return band, None, "Input file not found", None
+    
+    try:
+        # Clip the band - IDENTICAL SETTINGS to Landsat-8
+        error, info = _warp_to_clip(input_file, output_file, resample_alg='near')
+        return band, (output_file if error is None else None), error, info
+        
+    except Exception as e:
+        return band, None, str(e), None
+
+def _clip_one_file(input_file):
+    """Clip one mosaic found by the batch scan in a worker process, returning (input, path, error, info)"""
+    filename = os.path.basename(input_file)
+    
+    # Create output filename (append _CLIPPED before .tif) - IDENTICAL to Landsat-8
+    if filename.endswith(".tif"):
+        output_filename = filename.replace(".tif", "_CLIPPED.tif")
+    else:
+        output_filename = f"{filename}_CLIPPED.tif"
+    
+    output_file = os.path.join(output_dir, output_filename)
+    
+    try:
+        # Clip the file - IDENTICAL SETTINGS to Landsat-8 Option 2
+        error, info = _warp_to_clip(input_file, output_file)
+        return input_file, (output_file if error is None else None), error, info
+        
+    except Exception as e:
+        return input_file, None, str(e), None
+
 def clip_individual_bands():
     """Clip each Sentinel-2 band separately - IDENTICAL METHOD to Landsat-8"""
     print("=" * 70)
@@ -51,81 +268,34 @@ def clip_individual_bands():
     clipped_bands = []
     failed_bands = []
     
-    for band in sentinel_bands:
-        # Sentinel-2 files use pattern: Alberta_2020_S2_B2_NAD83_StatsCan.tif
-        input_file = os.path.join(mosaic_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan.tif")
-        output_file = os.path.join(output_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan_CLIPPED.tif")
-        
-        print(f"\nProcessing Sentinel-2 band {band}...")
-        print(f"  Input: {os.path.basename(input_file)}")
+    # Rasterize the boundary before the workers start, so they all read the same mask
+    build_cutline_mask()
+    
+    # Results come back in sentinel_bands order
+    with ProcessPoolExecutor(max_workers=MAX_CLIP_WORKERS) as executor:
+        results = list(executor.map(_clip_one, sentinel_bands))
+    
+    for band, output_file, error, info in results:
+        print(f"\nProcessed Sentinel-2 band {band}...")
         
-        if not os.path.exists(input_file):
-            print(f"  ✗ ERROR: Input file not found!")
-            failed_bands.append((band, "Input file not found"))
+        if error is not None:
+            print(f"  ✗ ERROR: {error}")
+            failed_bands.append((band, error))
             continue
         
-        try:
-            # Clip the band - IDENTICAL SETTINGS to Landsat-8
-            warp_options = gdal.WarpOptions(
-                format="GTiff",
-                cutlineDSName=alberta_gpkg,
-                cropToCutline=True,          # Same as Landsat-8
-                dstNodata=0,                 # Same as Landsat-8
-                resampleAlg='near',          # Same as Landsat-8
-                creationOptions=[
-                    "COMPRESS=LZW",          # Same as Landsat-8
-                    "PREDICTOR=2",           # Same as Landsat-8
-                    "TILED=YES",             # Same as Landsat-8
-                    "BLOCKXSIZE=256",        # Same as Landsat-8
-                    "BLOCKYSIZE=256",        # Same as Landsat-8
-                    "BIGTIFF=YES",           # Same as Landsat-8
-                    "NUM_THREADS=ALL_CPUS"   # Same as Landsat-8
-                ],
-                # Preserve original resolution and CRS - IDENTICAL to Landsat-8
-                xRes=30,  # 30m resolution - Same as Landsat-8
-                yRes=30,  # 30m resolution - Same as Landsat-8
-                targetAlignedPixels=False # Same as Landsat-8 - Allows pixel boundaries to shift
-            )
-            
-            print(f"  Clipping to Alberta boundary...")
-            ds = gdal.Warp(output_file, input_file, options=warp_options)
-            ds = None
-            
-            # Verify the output - IDENTICAL to Landsat-8
-            if os.path.exists(output_file):
-                # Get file info
-                ds = gdal.Open(output_file)
-                width = ds.RasterXSize
-                height = ds.RasterYSize
-                gt = ds.GetGeoTransform()
-                proj = ds.GetProjection()
-                
-                # Get band information
-                raster_band = ds.GetRasterBand(1)
-                data_type = gdal.GetDataTypeName(raster_band.DataType)
-                no_data = raster_band.GetNoDataValue()
-                
-                ds = None
-                
-                file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
-                
-                print(f"  ✓ SUCCESS: Clipped Sentinel-2 band {band}")
-                print(f"    Output: {os.path.basename(output_file)}")
-                print(f"    Size: {width} x {height} pixels")
-                print(f"    Data type: {data_type}")
-                print(f"    NoData value: {no_data}")
-                print(f"    Resolution: {gt[1]:.2f} m")
-                print(f"    File size: {file_size_mb:.1f} MB")
-                print(f"    CRS preserved: {'3979' in proj}")
-                
-                clipped_bands.append((band, output_file))
-            else:
-                print(f"  ✗ ERROR: Output file was not created")
-                failed_bands.append((band, "Output file creation failed"))
-                
-        except Exception as e:
-            print(f"  ✗ ERROR: {str(e)}")
-            failed_bands.append((band, str(e)))
+        if info['cached']:
+            print(f"  ✓ SKIPPED: Sentinel-2 band {band} already clipped (S2_CLIP_OVERWRITE=1 redoes it)")
+        else:
+            print(f"  ✓ SUCCESS: Clipped Sentinel-2 band {band}")
+        print(f"    Output: {os.path.basename(output_file)}")
+        print(f"    Size: {info['width']} x {info['height']} pixels")
+        print(f"    Data type: {info['data_type']}")
+        print(f"    NoData value: {info['no_data']}")
+        print(f"    Resolution: {info['resolution']:.2f} m")
+        print(f"    File size: {info['file_size_mb']:.1f} MB")
+        print(f"    CRS preserved: {info['crs_preserved']}")
+        
+        clipped_bands.append((band, output_file))
     
     # Summary - IDENTICAL to Landsat-8
     print("\n" + "=" * 70)
@@ -157,86 +327,40 @@ def batch_clip_all_files():
     print("BATCH CLIPPING ALL SENTINEL-2 FILES - IDENTICAL TO LANDSAT-8")
     print("=" * 70)
     
-    # Find all Sentinel-2 mosaic files
-    pattern = os.path.join(mosaic_dir, "Alberta_2020_S2_*.tif")
-    mosaic_files = glob.glob(pattern)
+    # Find the Sentinel-2 band mosaics in one directory scan
+    with os.scandir(mosaic_dir) as entries:
+        valid_files = sorted(entry.path for entry in entries
+                             if entry.is_file()
+                             and entry.name.startswith("Alberta_2020_S2_B")
+                             and entry.name.endswith("NAD83_StatsCan.tif"))
     
-    if not mosaic_files:
+    if not valid_files:
         print("No Sentinel-2 mosaic files found!")
-        print(f"Checked pattern: {pattern}")
+        print(f"Checked pattern: {os.path.join(mosaic_dir, 'Alberta_2020_S2_B*NAD83_StatsCan.tif')}")
         return []
     
-    # Filter only Sentinel-2 band files
-    valid_files = []
-    for filepath in mosaic_files:
-        filename = os.path.basename(filepath)
-        # Check if it matches our Sentinel-2 pattern
-        if "Alberta_2020_S2_B" in filename and "NAD83_StatsCan.tif" in filename:
-            valid_files.append(filepath)
-    
     print(f"Found {len(valid_files)} Sentinel-2 mosaic files to clip")
     
     clipped_files = []
     failed_files = []
     
-    for i, input_file in enumerate(valid_files, 1):
+    build_cutline_mask()
+    
+    with ProcessPoolExecutor(max_workers=max(1, min(len(valid_files), MAX_CLIP_WORKERS))) as executor:
+        results = list(executor.map(_clip_one_file, valid_files))
+    
+    for i, (input_file, output_file, error, info) in enumerate(results, 1):
         filename = os.path.basename(input_file)
+        print(f"\n[{i}/{len(valid_files)}] Processed {filename}...")
         
-        # Create output filename (append _CLIPPED before .tif) - IDENTICAL to Landsat-8
-        if filename.endswith(".tif"):
-            output_filename = filename.replace(".tif", "_CLIPPED.tif")
-        else:
-            output_filename = f"{filename}_CLIPPED.tif"
-        
-        output_file = os.path.join(output_dir, output_filename)
-        
-        print(f"\n[{i}/{len(valid_files)}] Processing {filename}...")
+        if error is not None:
+            print(f"  ✗ ERROR: {error}")
+            failed_files.append((filename, error))
+            continue
         
-        try:
-            # Clip the file - IDENTICAL SETTINGS to Landsat-8 Option 2
-            warp_options = gdal.WarpOptions(
-                format="GTiff",
-                cutlineDSName=alberta_gpkg,
-                cropToCutline=True,          # Same as Landsat-8
-                dstNodata=0,                 # Same as Landsat-8
-                creationOptions=[
-                    "COMPRESS=LZW",          # Same as Landsat-8
-                    "PREDICTOR=2",           # Same as Landsat-8
-                    "TILED=YES",             # Same as Landsat-8
-                    "BLOCKXSIZE=256",        # Same as Landsat-8
-                    "BLOCKYSIZE=256",        # Same as Landsat-8
-                    "BIGTIFF=YES",           # Same as Landsat-8
-                    "NUM_THREADS=ALL_CPUS"   # Same as Landsat-8
-                ],
-                xRes=30,                     # Same as Landsat-8
-                yRes=30,                     # Same as Landsat-8
-                targetAlignedPixels=False     # Same as Landsat-8 Option 2
-            )
-            
-            ds = gdal.Warp(output_file, input_file, options=warp_options)
-            ds = None
-            
-            if os.path.exists(output_file):
-                # Verify the file - IDENTICAL to Landsat-8
-                ds = gdal.Open(output_file)
-                if ds:
-                    width = ds.RasterXSize
-                    height = ds.RasterYSize
-                    gt = ds.GetGeoTransform()
-                    ds = None
-                    
-                    print(f"  ✓ Clipped: {width} x {height} pixels, {gt[1]:.2f}m resolution")
-                    clipped_files.append(output_file)
-                else:
-                    print(f"  ✗ ERROR: Could not verify output file")
-                    failed_files.append((filename, "Verification failed"))
-            else:
-                print(f"  ✗ ERROR: Output file was not created")
-                failed_files.append((filename, "File creation failed"))
-                
-        except Exception as e:
-            print(f"  ✗ ERROR: {str(e)}")
-            failed_files.append((filename, str(e)))
+        status = "Already clipped" if info['cached'] else "Clipped"
+        print(f"  ✓ {status}: {info['width']} x {info['height']} pixels, {info['resolution']:.2f}m resolution")
+        clipped_files.append(output_file)
     
     # Summary - IDENTICAL to Landsat-8
     print("\n" + "=" * 70)
@@ -278,20 +402,16 @@ if __name__ == "__main__":
     # Create output directory - IDENTICAL to Landsat-8
     os.makedirs(output_dir, exist_ok=True)
     
-    print("\nSelect processing option - IDENTICAL to Landsat-8:")
-    print("1. Clip known Sentinel-2 bands (B2 to B12)")
-    print("2. Batch clip all Sentinel-2 files in directory (automatic detection)")
-    
-    choice = input("\nEnter your choice (1 or 2): ").strip()
+    print(f"\nProcessing option (S2_CLIP_MODE): {clip_mode}")
     
-    if choice == "1":
+    if clip_mode == "individual":
         clipped_bands = clip_individual_bands()
         
-    elif choice == "2":
+    elif clip_mode == "batch":
         clipped_files = batch_clip_all_files()
         
     else:
-        print("Invalid choice. Please run the script again.")
+        print(f"Invalid S2_CLIP_MODE '{clip_mode}'. Use 'individual' or 'batch'.")
         exit(1)
     
     print("\n" + "=" * 70)
@@ -308,7 +428,7 @@ if __name__ == "__main__":
     print("   - Same cropToCutline=True")
     print("   - Same xRes=30, yRes=30")
     print("   - Same resampleAlg='near'")
-    print("   - Same compression (LZW, PREDICTOR=2)")
+    print("   - Same compression (ZSTD, PREDICTOR=2)")
     print("   - Same NoData value (0)")
     print("\nFor comparison, use equivalent bands:")
     print("   - Sentinel-2 B2 (Blue)      ↔ Landsat-8 SR_B2 (Blue)")
@@ -19,6 +19,18 @@ TARGET_RESOLUTION = 30  # 30 meters
 # Sentinel-2 bands you have (based on your description)
 SENTINEL_BANDS = ['B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B11', 'B12']
 
+# GeoTIFF creation options for the mosaics (same ZSTD level 1 compression as Landsat-8)
+MOSAIC_CREATION_OPTIONS = [
+    'COMPRESS=ZSTD',
+    'ZSTD_LEVEL=1',
+    'PREDICTOR=2',
+    'TILED=YES',
+    'BLOCKXSIZE=512',
+    'BLOCKYSIZE=512',
+    'BIGTIFF=YES',
+    'NUM_THREADS=ALL_CPUS'
+]
+
 def get_all_bands():
     """Get list of all Sentinel-2 bands from the downloaded folders - IDENTICAL to Landsat-8"""
     bands = []
@@ -138,15 +150,7 @@ def create_mosaic_no_reprojection(band_folder, band_name):
         # Use translate with EXACT SAME OPTIONS as Landsat-8
         translate_options = gdal.TranslateOptions(
             format='GTiff',
-            creationOptions=[
-                'COMPRESS=LZW',      # Same as Landsat-8
-                'PREDICTOR=2',       # Same as Landsat-8
-                'TILED=YES',         # Same as Landsat-8
-                'BLOCKXSIZE=256',    # Same as Landsat-8
-                'BLOCKYSIZE=256',    # Same as Landsat-8
-                'BIGTIFF=YES',       # Same as Landsat-8
-                'NUM_THREADS=ALL_CPUS'  # Same as Landsat-8
-            ]
+            creationOptions=MOSAIC_CREATION_OPTIONS
         )
         
         print(f"    Translating VRT to GeoTIFF...")
@@ -490,8 +494,8 @@ if __name__ == "__main__":
     print("IDENTICAL PROCESSING METHOD CONFIRMED:")
     print("=" * 80)
     print("✓ VRT creation: Same options (nearest neighbor, NoData=0)")
-    print("✓ GeoTIFF translation: Same compression (LZW, PREDICTOR=2)")
-    print("✓ Tiling: Same block size (256x256)")
+    print("✓ GeoTIFF translation: Same compression (ZSTD, PREDICTOR=2)")
+    print("✓ Tiling: 512x512 blocks")
     print("✓ Threading: Same (NUM_THREADS=ALL_CPUS)")
     print("✓ No reprojection: Both datasets already EPSG:3979")
     print("✓ Output format: Same GeoTIFF with BIGTIFF=YES")
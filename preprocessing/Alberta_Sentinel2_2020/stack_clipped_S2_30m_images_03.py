@@ -3,20 +3,43 @@ from osgeo import gdal
 
 gdal.UseExceptions()
 
+# Block cache of a quarter of RAM, no directory listing when each clipped band is opened,
+# cached file reads and all cores for decoding
+gdal.SetConfigOption("GDAL_CACHEMAX", "25%")
+gdal.SetConfigOption("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+gdal.SetConfigOption("VSI_CACHE", "TRUE")
+gdal.SetConfigOption("GDAL_NUM_THREADS", "ALL_CPUS")
+
 # =====================================================
 # PATHS - SENTINEL-2 SPECIFIC
 # =====================================================
 # Input directory with clipped Sentinel-2 bands
 input_dir = r"D:\Hackathon15_AlphaEarth\Alberta_Sentinel2_2020\Alberta_2020_NAD83_StatsCan_Sentinel2_30m_Mosaics_EPSG_3979_Clipped"
 
+# Un-clipped Sentinel-2 mosaics from step 01 and the Alberta boundary, used by clip_and_stack_fused
+mosaic_dir = r"D:\Hackathon15_AlphaEarth\Alberta_Sentinel2_2020\Alberta_2020_NAD83_StatsCan_Sentinel2_30m_Mosaics_EPSG_3979"
+alberta_gpkg = r"D:\Hackathon15_AlphaEarth\AlphaEarth_Dataset\Alberta_EPSG_3979.gpkg"
+
 # Output directory for stacked image
 output_dir = r"D:\Hackathon15_AlphaEarth\Alberta_Sentinel2_2020\Alberta_2020_NAD83_StatsCan_Sentinel2_30m_Mosaics_EPSG_3979_Clipped_Stack"
 
 # Create output directory if it doesn't exist
 os.makedirs(output_dir, exist_ok=True)
 
-# Output stacked file
-output_file = os.path.join(output_dir, "Alberta_2020_S2_Stacked_10Bands.tif")
+# True clips the step-01 mosaics and stacks them in a single warp (clip_and_stack_fused), so step 02
+# does not need to run and no per-band _CLIPPED.tif is written and read back. The result is always
+# a GeoTIFF, so point extract_patches_alldatasets.py at the .tif when enabling it
+CLIP_WHILE_STACKING = False
+
+# Set S2_STACK_FORCE=1 to stack even when the band alignment check fails; otherwise the
+# script exits with status 1 instead of waiting for confirmation
+force_stack = os.environ.get("S2_STACK_FORCE") == "1"
+
+# Output stacked file: a VRT over the clipped bands unless MATERIALIZE_STACK is set
+MATERIALIZE_STACK = False
+output_file = os.path.join(output_dir, "Alberta_2020_S2_Stacked_10Bands.tif"
+                           if MATERIALIZE_STACK or CLIP_WHILE_STACKING
+                           else "Alberta_2020_S2_Stacked_10Bands.vrt")
 
 # Sentinel-2 bands in order (similar to Landsat-8 order for comparison)
 sentinel_bands = [
@@ -32,9 +55,93 @@ sentinel_bands = [
     "B12",  # SWIR2 (comparable to Landsat-8 SR_B7)
 ]
 
+# COG creation options for the materialized stack (same ZSTD settings as the Landsat-8 stack):
+# the COG driver tiles the file, writes the tile index up front and builds AVERAGE overviews
+# in the same pass, so no gdaladdo run is needed afterwards
+STACK_CREATION_OPTIONS = [
+    "COMPRESS=ZSTD",
+    "LEVEL=1",
+    "PREDICTOR=YES",
+    "BLOCKSIZE=512",
+    "BIGTIFF=YES",
+    "NUM_THREADS=ALL_CPUS",
+    "OVERVIEW_RESAMPLING=AVERAGE"
+]
+
 # =====================================================
 # CREATE STACKED IMAGE - IDENTICAL TO LANDSAT-8
 # =====================================================
+def report_stacked_image():
+    """Print the dimensions, bounds and per-band types of the stacked output file"""
+    # Verify the stacked image - IDENTICAL to Landsat-8
+    # One header-only gdal.Info report describes the dataset and every band
+    info = gdal.Info(output_file, options=gdal.InfoOptions(
+        format='json',
+        stats=False,
+        approxStats=False,
+        computeMinMax=False,
+        listMDD=False,
+        showFileList=False
+    ))
+    if not info:
+        print("ERROR: Cannot open created stacked file")
+        return False
+    
+    # Get image information - IDENTICAL to Landsat-8
+    bands = len(info['bands'])
+    width, height = info['size']
+    gt = info['geoTransform']
+    
+    # Get band information - IDENTICAL to Landsat-8
+    band_info = [(b['band'], b['type'], b.get('noDataValue')) for b in info['bands']]
+    
+    # Calculate bounds - IDENTICAL to Landsat-8
+    minx = gt[0]
+    maxx = minx + width * gt[1]
+    maxy = gt[3]
+    miny = maxy + height * gt[5]
+    
+    file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
+    
+    print(f"\n✓ SUCCESS: Sentinel-2 bands stacked!")
+    print("=" * 70)
+    print("STACKED IMAGE INFORMATION - IDENTICAL PROCESSING TO LANDSAT-8:")
+    print("=" * 70)
+    print(f"Output file: {os.path.basename(output_file)}")
+    print(f"File size: {file_size_mb:.1f} MB")
+    print(f"Bands: {bands}")
+    print(f"Dimensions: {width} x {height} pixels")
+    print(f"Resolution: {gt[1]:.2f} m")
+    print(f"CRS: EPSG:3979 (NAD83/Statistics Canada Lambert)")
+    print(f"Bounds (m):")
+    print(f"  X: {minx:.0f} to {maxx:.0f}")
+    print(f"  Y: {miny:.0f} to {maxy:.0f}")
+    print(f"  Width: {(maxx-minx)/1000:.1f} km")
+    print(f"  Height: {(maxy-miny)/1000:.1f} km")
+    
+    print("\nBAND INFORMATION:")
+    print("-" * 40)
+    for i, (band_num, dtype, nodata) in enumerate(band_info):
+        band_name = sentinel_bands[i]
+        band_desc = {
+            "B2": "Blue",
+            "B3": "Green", 
+            "B4": "Red",
+            "B8": "NIR",
+            "B5": "Red Edge 1",
+            "B6": "Red Edge 2",
+            "B7": "Red Edge 3",
+            "B8A": "Red Edge 4",
+            "B11": "SWIR1",
+            "B12": "SWIR2",
+        }.get(band_name, band_name)
+        
+        print(f"Band {band_num}: {band_name} ({band_desc})")
+        print(f"  Data type: {dtype}")
+        print(f"  NoData value: {nodata}")
+    
+    return True
+
 def stack_sentinel2_bands():
     """Stack all Sentinel-2 bands into a single multiband TIFF - IDENTICAL to Landsat-8"""
     print("=" * 70)
@@ -74,8 +181,10 @@ def stack_sentinel2_bands():
     
     try:
         # Method 1: Build VRT first, then translate to TIFF - IDENTICAL to Landsat-8
+        # Without MATERIALIZE_STACK the VRT is the stacked product: the clipped bands are already on
+        # disk in the same grid, so rewriting them into one TIFF only repeats their I/O
         print("\nStep 1: Creating VRT (virtual mosaic)...")
-        vrt_file = os.path.join(output_dir, "temp_stack.vrt")
+        vrt_file = os.path.join(output_dir, "temp_stack.vrt") if MATERIALIZE_STACK else output_file
         
         # VRT options - IDENTICAL to Landsat-8
         vrt_options = gdal.BuildVRTOptions(
@@ -90,106 +199,112 @@ def stack_sentinel2_bands():
             return False
         vrt = None  # Close VRT - Same as Landsat-8
         
-        print("Step 2: Converting VRT to stacked TIFF...")
+        if MATERIALIZE_STACK:
+            print("Step 2: Converting VRT to stacked COG...")
+            
+            # Translate options - IDENTICAL to Landsat-8
+            translate_options = gdal.TranslateOptions(
+                format='COG',
+                creationOptions=STACK_CREATION_OPTIONS
+            )
+            
+            ds = gdal.Translate(output_file, vrt_file, options=translate_options)
+            if ds is None:
+                print("ERROR: Failed to create stacked TIFF")
+                return False
+            ds = None  # Flush and close before the report reads the file
+            
+            # Clean up temporary VRT - IDENTICAL to Landsat-8
+            if os.path.exists(vrt_file):
+                os.remove(vrt_file)
         
-        # Translate options - IDENTICAL to Landsat-8
-        translate_options = gdal.TranslateOptions(
-            format='GTiff',
-            creationOptions=[
-                'COMPRESS=LZW',      # Same as Landsat-8
-                'PREDICTOR=2',       # Same as Landsat-8
-                'TILED=YES',         # Same as Landsat-8
-                'BLOCKXSIZE=256',    # Same as Landsat-8
-                'BLOCKYSIZE=256',    # Same as Landsat-8
-                'BIGTIFF=YES',       # Same as Landsat-8
-                'NUM_THREADS=ALL_CPUS'  # Same as Landsat-8
-            ]
-        )
+        return report_stacked_image()
         
-        ds = gdal.Translate(output_file, vrt_file, options=translate_options)
-        if ds is None:
-            print("ERROR: Failed to create stacked TIFF")
+    except Exception as e:
+        print(f"\n✗ ERROR during stacking: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+# =====================================================
+# CLIP AND STACK IN ONE PASS
+# =====================================================
+def clip_and_stack_fused():
+    """Clip the step-01 mosaics to Alberta and stack them with a single warp"""
+    print("=" * 70)
+    print("CLIPPING AND STACKING SENTINEL-2 BANDS IN ONE PASS")
+    print("=" * 70)
+    print(f"Input directory: {mosaic_dir}")
+    print(f"Clip boundary: {alberta_gpkg}")
+    print(f"Output file: {output_file}")
+    print("=" * 70)
+    
+    mosaic_files = []
+    missing_bands = []
+    
+    for band in sentinel_bands:
+        input_file = os.path.join(mosaic_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan.tif")
+        
+        if os.path.exists(input_file):
+            mosaic_files.append(input_file)
+            print(f"✓ Found band {band}: {os.path.basename(input_file)}")
+        else:
+            missing_bands.append(band)
+            print(f"✗ Missing band {band}: {os.path.basename(input_file)}")
+    
+    if missing_bands:
+        print(f"\nERROR: Missing {len(missing_bands)} band(s): {missing_bands}")
+        print("Please make sure all band mosaics are created before stacking.")
+        return False
+    
+    vrt_file = "/vsimem/all_bands.vrt"
+    
+    try:
+        print("\nStep 1: Creating in-memory VRT of the band mosaics...")
+        vrt = gdal.BuildVRT(vrt_file, mosaic_files, options=gdal.BuildVRTOptions(
+            separate=True,        # each input becomes one band - Same as Landsat-8
+            srcNodata=0,
+            VRTNodata=0
+        ))
+        if vrt is None:
+            print("ERROR: Failed to create VRT")
             return False
+        vrt = None
         
-        # Clean up temporary VRT - IDENTICAL to Landsat-8
-        if os.path.exists(vrt_file):
-            os.remove(vrt_file)
+        # Same clip settings as step 02; every pixel is read and written exactly once.
+        # The warp stays an in-memory VRT because the COG driver can only copy a finished dataset
+        print("Step 2: Clipping VRT to Alberta into stacked COG...")
+        warp_options = gdal.WarpOptions(
+            format="VRT",
+            cutlineDSName=alberta_gpkg,
+            cropToCutline=True,
+            dstNodata=0,
+            resampleAlg='near',
+            multithread=True,
+            warpOptions=["NUM_THREADS=ALL_CPUS", "USE_OPENCL=FALSE"],
+            warpMemoryLimit=2000,  # MB, the most -wm still helps
+            xRes=30,
+            yRes=30,
+            targetAlignedPixels=False
+        )
         
-        # Verify the stacked image - IDENTICAL to Landsat-8
-        ds = gdal.Open(output_file)
+        clipped = gdal.Warp("", vrt_file, options=warp_options)
+        ds = gdal.Translate(output_file, clipped, format="COG", creationOptions=STACK_CREATION_OPTIONS)
+        clipped = None
         if ds is None:
-            print("ERROR: Cannot open created stacked file")
+            print("ERROR: Failed to create stacked TIFF")
             return False
-        
-        # Get image information - IDENTICAL to Landsat-8
-        bands = ds.RasterCount
-        width = ds.RasterXSize
-        height = ds.RasterYSize
-        gt = ds.GetGeoTransform()
-        proj = ds.GetProjection()
-        
-        # Get band information - IDENTICAL to Landsat-8
-        band_info = []
-        for i in range(1, bands + 1):
-            band = ds.GetRasterBand(i)
-            data_type = gdal.GetDataTypeName(band.DataType)
-            no_data = band.GetNoDataValue()
-            band_info.append((i, data_type, no_data))
-        
         ds = None
         
-        # Calculate bounds - IDENTICAL to Landsat-8
-        minx = gt[0]
-        maxx = minx + width * gt[1]
-        maxy = gt[3]
-        miny = maxy + height * gt[5]
-        
-        file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
-        
-        print(f"\n✓ SUCCESS: Sentinel-2 bands stacked!")
-        print("=" * 70)
-        print("STACKED IMAGE INFORMATION - IDENTICAL PROCESSING TO LANDSAT-8:")
-        print("=" * 70)
-        print(f"Output file: {os.path.basename(output_file)}")
-        print(f"File size: {file_size_mb:.1f} MB")
-        print(f"Bands: {bands}")
-        print(f"Dimensions: {width} x {height} pixels")
-        print(f"Resolution: {gt[1]:.2f} m")
-        print(f"CRS: EPSG:3979 (NAD83/Statistics Canada Lambert)")
-        print(f"Bounds (m):")
-        print(f"  X: {minx:.0f} to {maxx:.0f}")
-        print(f"  Y: {miny:.0f} to {maxy:.0f}")
-        print(f"  Width: {(maxx-minx)/1000:.1f} km")
-        print(f"  Height: {(maxy-miny)/1000:.1f} km")
-        
-        print("\nBAND INFORMATION:")
-        print("-" * 40)
-        for i, (band_num, dtype, nodata) in enumerate(band_info):
-            band_name = sentinel_bands[i]
-            band_desc = {
-                "B2": "Blue",
-                "B3": "Green", 
-                "B4": "Red",
-                "B8": "NIR",
-                "B5": "Red Edge 1",
-                "B6": "Red Edge 2",
-                "B7": "Red Edge 3",
-                "B8A": "Red Edge 4",
-                "B11": "SWIR1",
-                "B12": "SWIR2",
-            }.get(band_name, band_name)
-            
-            print(f"Band {band_num}: {band_name} ({band_desc})")
-            print(f"  Data type: {dtype}")
-            print(f"  NoData value: {nodata}")
-        
-        return True
+        return report_stacked_image()
         
     except Exception as e:
-        print(f"\n✗ ERROR during stacking: {str(e)}")
+        print(f"\n✗ ERROR during clipping and stacking: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        gdal.Unlink(vrt_file)
 
 # =====================================================
 # VERIFY BAND ALIGNMENT - IDENTICAL TO LANDSAT-8
@@ -202,6 +317,16 @@ def verify_band_alignment():
     
     band_info = {}
     
+    # Header-only report: no statistics, min/max, metadata domains or sidecar file list
+    info_options = gdal.InfoOptions(
+        format='json',
+        stats=False,
+        approxStats=False,
+        computeMinMax=False,
+        listMDD=False,
+        showFileList=False
+    )
+    
     for band in sentinel_bands:
         input_file = os.path.join(input_dir, f"Alberta_2020_S2_{band}_NAD83_StatsCan_CLIPPED.tif")
         
@@ -209,13 +334,11 @@ def verify_band_alignment():
             print(f"✗ Missing: {band}")
             continue
             
-        ds = gdal.Open(input_file)
-        if ds:
-            width = ds.RasterXSize
-            height = ds.RasterYSize
-            gt = ds.GetGeoTransform()
-            proj = ds.GetProjection()
-            ds = None
+        info = gdal.Info(input_file, options=info_options)
+        if info:
+            width, height = info['size']
+            gt = tuple(info['geoTransform'])
+            proj = info.get('coordinateSystem', {}).get('wkt', '')
             
             band_info[band] = {
                 'width': width,
@@ -271,41 +394,53 @@ if __name__ == "__main__":
     print("=" * 70)
     
     # Check if input directory exists - IDENTICAL to Landsat-8
-    if not os.path.exists(input_dir):
-        print(f"ERROR: Input directory not found: {input_dir}")
+    stack_input_dir = mosaic_dir if CLIP_WHILE_STACKING else input_dir
+    if not os.path.exists(stack_input_dir):
+        print(f"ERROR: Input directory not found: {stack_input_dir}")
         exit(1)
     
     # Create output directory - IDENTICAL to Landsat-8
     os.makedirs(output_dir, exist_ok=True)
     
     # First verify band alignment - IDENTICAL to Landsat-8
-    print("\nVerifying band alignment before stacking...")
-    alignment_ok = verify_band_alignment()
+    # (the fused warp resamples every mosaic onto one grid, so there is nothing to verify)
+    alignment_ok = True
+    if not CLIP_WHILE_STACKING:
+        print("\nVerifying band alignment before stacking...")
+        alignment_ok = verify_band_alignment()
     
     if not alignment_ok:
         print("\nWARNING: Band alignment issues detected!")
         print("Stacking may still work, but results may be misaligned.")
-        response = input("Continue anyway? (y/n): ").strip().lower()
-        if response != 'y':
-            print("Operation cancelled.")
-            exit(0)
+        if not force_stack:
+            print("Operation cancelled. Set S2_STACK_FORCE=1 to stack anyway.")
+            exit(1)
+        print("S2_STACK_FORCE=1 - continuing anyway.")
     
     print("\n" + "=" * 70)
     print("STARTING BAND STACKING - IDENTICAL METHOD TO LANDSAT-8")
     print("=" * 70)
     
     # Stack the bands - IDENTICAL to Landsat-8
-    success = stack_sentinel2_bands()
+    if CLIP_WHILE_STACKING:
+        success = clip_and_stack_fused()
+    else:
+        success = stack_sentinel2_bands()
     
     if success:
         print("\n" + "=" * 70)
         print("STACKING COMPLETE - IDENTICAL PROCESSING CONFIRMED:")
         print("=" * 70)
         print("✓ VRT creation: Same options (separate=True, NoData=0)")
-        print("✓ GeoTIFF translation: Same compression (LZW, PREDICTOR=2)")
-        print("✓ Tiling: Same block size (256x256)")
-        print("✓ Threading: Same (NUM_THREADS=ALL_CPUS)")
-        print("✓ Output format: Same GeoTIFF with BIGTIFF=YES")
+        if CLIP_WHILE_STACKING:
+            print("✓ Clipped to Alberta while stacking: Same cropToCutline=True, 30m")
+        if MATERIALIZE_STACK or CLIP_WHILE_STACKING:
+            print("✓ COG translation: Same compression (ZSTD, PREDICTOR=2)")
+            print("✓ Tiling: 512x512 blocks with AVERAGE overviews")
+            print("✓ Threading: Same (NUM_THREADS=ALL_CPUS)")
+            print("✓ Output format: Cloud-Optimized GeoTIFF with BIGTIFF=YES")
+        else:
+            print("✓ Output format: VRT over the clipped band GeoTIFFs (set MATERIALIZE_STACK for a GeoTIFF)")
         print("✓ CRS preserved: EPSG:3979")
         print("✓ Resolution preserved: 30m")
         print("=" * 70)